@@ -0,0 +1,52 @@
+#!/usr/bin/python3
+"""Benchmark of storage.bulk_new() against one save() per object
+
+Runs on the engine selected by HBNB_TYPE_STORAGE. For a file store the
+snapshot goes to a temporary file; for the database engines point
+HBNB_SQLITE_PATH (or the HBNB_MYSQL_* variables) at a scratch database.
+The one-save-per-object loop is timed on at most 2000 objects and its
+rate is compared with bulk_new() on all of them.
+
+Usage: ./benchmarks/bulk_insert.py [number_of_objects]
+"""
+import os
+import sys
+import tempfile
+import time
+from models import storage
+from models.engine.file_storage import FileStorage
+from models.state import State
+
+
+def timed(func):
+    """Runs func and returns the seconds it took"""
+    start = time.perf_counter()
+    func()
+    return time.perf_counter() - start
+
+
+def one_by_one(objs):
+    """Stores objs the way BaseModel.save() does, a save per object"""
+    for obj in objs:
+        storage.new(obj)
+        storage.save()
+
+
+if __name__ == "__main__":
+    total = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+    if isinstance(storage, FileStorage):
+        path = os.path.join(tempfile.mkdtemp(), 'file.json')
+        FileStorage._FileStorage__file_path = path
+        for obj in list(storage.all().values()):
+            storage.delete(obj)
+        FileStorage._FileStorage__dirty.clear()
+
+    few = min(total, 2000)
+    elapsed = timed(lambda: one_by_one(
+        [State(name='one {}'.format(i)) for i in range(few)]))
+    print("save per object: {:7d} objects {:7.2f} s  {:9.0f} /s".format(
+        few, elapsed, few / elapsed))
+    elapsed = timed(lambda: storage.bulk_new(
+        [State(name='bulk {}'.format(i)) for i in range(total)]))
+    print("bulk_new       : {:7d} objects {:7.2f} s  {:9.0f} /s".format(
+        total, elapsed, total / elapsed))
@@ -0,0 +1,75 @@
+#!/usr/bin/python3
+"""Benchmark of the console export and import commands
+
+Stores cities in storage, exports them to JSON Lines and to CSV, then
+empties storage and imports each file, reporting the rate and the
+tracemalloc peak of every step. Run it with HBNB_TYPE_STORAGE=sqlite
+(and HBNB_SQLITE_PATH pointing to a scratch file) to see the memory of
+a database engine stay bounded; FileStorage holds every object anyway.
+
+Usage: ./benchmarks/export_import.py [number_of_cities]
+"""
+import io
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+from contextlib import redirect_stdout
+from console import HBNBCommand
+from models import storage
+from models.city import City
+from models.state import State
+
+
+def measure(func):
+    """Runs func and returns (seconds, peak traced bytes)"""
+    tracemalloc.start()
+    start = time.perf_counter()
+    func()
+    elapsed = time.perf_counter() - start
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return elapsed, peak
+
+
+def clear():
+    """Deletes every city and state"""
+    for cls in (City, State):
+        for obj in list(storage.stream(cls)):
+            storage.delete(obj)
+    storage.save()
+
+
+def run(console, line):
+    """Runs a console command, failing on a ** message **"""
+    out = io.StringIO()
+    with redirect_stdout(out):
+        console.onecmd(line)
+    if '**' in out.getvalue():
+        sys.exit(out.getvalue())
+
+
+if __name__ == "__main__":
+    total = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+    console = HBNBCommand()
+    tmp = tempfile.mkdtemp()
+    clear()
+    state = State(name="state")
+    state.save()
+    storage.bulk_new(City(name='city {}'.format(i), state_id=state.id)
+                     for i in range(total))
+    print("{} cities, {}".format(total, type(storage).__name__))
+    for name in ('cities.jsonl', 'cities.csv'):
+        path = os.path.join(tmp, name)
+        elapsed, peak = measure(lambda: run(console, 'export all ' + path))
+        print("export {:13s} {:7.2f} s {:9.0f} /s {:8.1f} MB peak".format(
+            name, elapsed, total / elapsed, peak / 1e6))
+    for name in ('cities.jsonl', 'cities.csv'):
+        path = os.path.join(tmp, name)
+        clear()
+        elapsed, peak = measure(lambda: run(console, 'import ' + path))
+        print("import {:13s} {:7.2f} s {:9.0f} /s {:8.1f} MB peak".format(
+            name, elapsed, total / elapsed, peak / 1e6))
+        os.remove(path)
+    clear()
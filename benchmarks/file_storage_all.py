@@ -0,0 +1,55 @@
+#!/usr/bin/python3
+"""Benchmark of FileStorage.all(cls) on a large mixed store
+
+Compares the partitioned lookup with the previous full scan that ran
+isinstance on every stored object.
+
+Usage: ./benchmarks/file_storage_all.py [number_of_objects]
+"""
+import sys
+import time
+from models import storage
+from models.amenity import Amenity
+from models.city import City
+from models.place import Place
+from models.review import Review
+from models.state import State
+from models.user import User
+
+
+def scan_all(cls):
+    """all(cls) as it was implemented before partitioning"""
+    dic = {}
+    for key, val in storage.all().items():
+        if isinstance(val, cls):
+            dic.update({key: val})
+    return dic
+
+
+def best_of(func, repeat=5):
+    """Returns the best wall time of repeat calls to func"""
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+if __name__ == "__main__":
+    total = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+    # a realistic mix: few states, many places and reviews
+    mix = [(State, 1), (City, 10), (User, 20), (Amenity, 2),
+           (Place, 30), (Review, 37)]
+    for cls, share in mix:
+        for _ in range(total * share // 100):
+            storage.new(cls())
+    print("objects in storage: {}".format(len(storage.all())))
+    for cls, _ in mix:
+        scanned = best_of(lambda: scan_all(cls))
+        partitioned = best_of(lambda: storage.all(cls))
+        print("all({:<8}) {:>6} objs  scan {:8.2f} ms  partition {:8.3f} ms"
+              "  x{:.0f}".format(cls.__name__, len(storage.all(cls)),
+                                 scanned * 1000, partitioned * 1000,
+                                 scanned / partitioned))
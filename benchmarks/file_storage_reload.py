@@ -0,0 +1,70 @@
+#!/usr/bin/python3
+"""Benchmark of FileStorage.reload() peak memory and time
+
+Writes a store of mixed objects to a temporary file, then reloads it
+once with json.load followed by hydration (the previous behaviour) and
+once with the streaming reload, reporting tracemalloc peaks.
+
+Usage: ./benchmarks/file_storage_reload.py [number_of_objects]
+"""
+import json
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+from models import storage
+from models.engine.file_storage import FileStorage
+from models.city import City
+from models.place import Place
+from models.state import State
+
+
+def measure(func):
+    """Runs func and returns (seconds, peak traced bytes)"""
+    tracemalloc.start()
+    start = time.perf_counter()
+    func()
+    elapsed = time.perf_counter() - start
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return elapsed, peak
+
+
+def clear():
+    """Empties storage without recording deletions"""
+    for obj in list(storage.all().values()):
+        storage.delete(obj)
+    FileStorage._FileStorage__dirty.clear()
+
+
+def load_whole(path):
+    """Reload as done before streaming: parse everything, then build"""
+    classes = {'State': State, 'City': City, 'Place': Place}
+    with open(path, 'r') as f:
+        temp = json.load(f)
+    for key, val in temp.items():
+        storage.new(classes[val['__class__']](**val))
+
+
+if __name__ == "__main__":
+    total = int(sys.argv[1]) if len(sys.argv) > 1 else 200000
+    path = os.path.join(tempfile.mkdtemp(), 'file.json')
+    FileStorage._FileStorage__file_path = path
+    clear()
+    for i in range(total):
+        cls = (State, City, Place)[i % 3]
+        storage.new(cls(name='name {}'.format(i), description='x' * 200))
+    storage.save()
+    clear()
+    print("store: {} objects, {:.1f} MB".format(
+        total, os.path.getsize(path) / 1e6))
+
+    elapsed, peak = measure(lambda: load_whole(path))
+    print("json.load + build : {:6.2f} s  peak {:7.1f} MB".format(
+        elapsed, peak / 1e6))
+    clear()
+    elapsed, peak = measure(storage.reload)
+    print("streaming reload  : {:6.2f} s  peak {:7.1f} MB".format(
+        elapsed, peak / 1e6))
+    os.remove(path)
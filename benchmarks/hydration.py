@@ -0,0 +1,98 @@
+#!/usr/bin/python3
+"""Benchmark of building and serializing objects in bulk
+
+Compares, on the same records, cls(**record) with cls.from_records()
+and the previous to_dict() (class name parsed from str(type(obj)))
+with the current one, then times a cold FileStorage.reload() and a
+full save of the whole store.
+
+Usage: ./benchmarks/hydration.py [number_of_records]
+"""
+import os
+import sys
+import tempfile
+import time
+from models import storage
+from models.engine.file_storage import FileStorage
+from models.city import City
+from models.place import Place
+from models.state import State
+
+
+def timed(func):
+    """Runs func and returns (seconds, its result)"""
+    start = time.perf_counter()
+    result = func()
+    return time.perf_counter() - start, result
+
+
+def old_to_dict(obj):
+    """to_dict() as it was written before the bulk path"""
+    dictionary = {}
+    dictionary.update(obj.__dict__)
+    dictionary.update({'__class__':
+                      (str(type(obj)).split('.')[-1]).split('\'')[0]})
+    dictionary['created_at'] = obj.created_at.isoformat()
+    dictionary['updated_at'] = obj.updated_at.isoformat()
+    try:
+        del dictionary["_sa_instance_state"]
+    except Exception:
+        pass
+    return dictionary
+
+
+def clear():
+    """Empties storage without recording deletions"""
+    for obj in list(storage.all().values()):
+        storage.delete(obj)
+    FileStorage._FileStorage__dirty.clear()
+
+
+def full_save():
+    """Saves every stored object, none of them encoded yet"""
+    FileStorage._FileStorage__encoded.clear()
+    for obj in list(storage.all().values()):
+        storage.new(obj)
+    storage.save()
+
+
+def report(name, total, elapsed):
+    """Prints one result line"""
+    print("{:28s} {:7.2f} s {:10.0f} /s".format(name, elapsed,
+                                                 total / elapsed))
+
+
+if __name__ == "__main__":
+    total = int(sys.argv[1]) if len(sys.argv) > 1 else 1000000
+    FileStorage._FileStorage__file_path = os.path.join(tempfile.mkdtemp(),
+                                                       'file.json')
+    clear()
+    classes = (State, City, Place)
+    records = [classes[i % 3](name='name {}'.format(i)).to_dict()
+               for i in range(total)]
+    by_class = {cls: [r for r in records if r['__class__'] == cls.__name__]
+                for cls in classes}
+    print("{} records".format(total))
+
+    elapsed, objs = timed(lambda: [cls(**r) for cls, rs in by_class.items()
+                                   for r in rs])
+    report("cls(**record)", total, elapsed)
+    clear()
+    elapsed, objs = timed(lambda: [o for cls, rs in by_class.items()
+                                   for o in cls.from_records(rs)])
+    report("cls.from_records(records)", total, elapsed)
+    elapsed, _ = timed(lambda: [old_to_dict(o) for o in objs])
+    report("previous to_dict()", total, elapsed)
+    elapsed, _ = timed(lambda: [o.to_dict() for o in objs])
+    report("to_dict()", total, elapsed)
+    clear()
+
+    storage.bulk_new(objs)
+    del objs, records, by_class
+    elapsed, _ = timed(full_save)
+    report("full save", total, elapsed)
+    clear()
+    FileStorage._FileStorage__seen = None
+    elapsed, _ = timed(storage.reload)
+    report("cold reload", total, elapsed)
+    os.remove(FileStorage._FileStorage__file_path)
@@ -0,0 +1,62 @@
+#!/usr/bin/python3
+"""Benchmark of insert throughput and index size, uuid4 against uuid7 ids
+
+Inserts rows shaped like places into a table clustered on its id, the
+way InnoDB stores them, once with random uuid4 ids and once with time
+ordered uuid7 ids, and reports rows per second and the size of the
+table. SQLite stands in for MySQL: a WITHOUT ROWID table is a B-tree
+on its primary key, and the page cache is kept small so that, as on a
+busy server, the table does not fit in memory.
+
+Usage: ./benchmarks/id_ordering.py [number_of_rows] [cache_pages]
+"""
+import os
+import sqlite3
+import sys
+import tempfile
+import time
+import uuid
+from models.base_model import uuid7
+
+SCHEMA = """CREATE TABLE places (
+    id VARCHAR(60) PRIMARY KEY, created_at TEXT, updated_at TEXT,
+    city_id VARCHAR(60), user_id VARCHAR(60), name VARCHAR(128),
+    description VARCHAR(1024), price_by_night INTEGER
+) WITHOUT ROWID"""
+
+
+def run(make_id, total, cache_pages):
+    """Inserts total rows with ids from make_id in a new database
+
+    Returns (seconds, bytes of the database, pages of the database).
+    """
+    path = os.path.join(tempfile.mkdtemp(), 'ids.db')
+    conn = sqlite3.connect(path)
+    conn.execute('PRAGMA cache_size = {}'.format(cache_pages))
+    conn.execute('PRAGMA journal_mode = WAL')
+    conn.execute(SCHEMA)
+    now = '2024-01-01T00:00:00'
+    start = time.perf_counter()
+    for first in range(0, total, 1000):
+        rows = [(str(make_id()), now, now, 'c', 'u', 'place {}'.format(i),
+                 'x' * 100, i) for i in range(first, min(total, first + 1000))]
+        conn.executemany('INSERT INTO places VALUES (?, ?, ?, ?, ?, ?, ?, ?)',
+                         rows)
+        conn.commit()
+    elapsed = time.perf_counter() - start
+    conn.execute('PRAGMA wal_checkpoint(TRUNCATE)')
+    pages = conn.execute('PRAGMA page_count').fetchone()[0]
+    conn.close()
+    size = os.path.getsize(path)
+    os.remove(path)
+    return elapsed, size, pages
+
+
+if __name__ == "__main__":
+    total = int(sys.argv[1]) if len(sys.argv) > 1 else 500000
+    cache_pages = int(sys.argv[2]) if len(sys.argv) > 2 else 500
+    for name, make_id in (('uuid4', uuid.uuid4), ('uuid7', uuid7)):
+        elapsed, size, pages = run(make_id, total, cache_pages)
+        print("{}: {:8d} rows {:7.2f} s {:9.0f} rows/s {:8.1f} MB"
+              " {:8d} pages".format(name, total, elapsed, total / elapsed,
+                                    size / 1e6, pages))
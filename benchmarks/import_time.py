@@ -0,0 +1,66 @@
+#!/usr/bin/python3
+"""Benchmark of the time taken by `import models` in file mode
+
+Each case runs in a new interpreter, from an empty directory, and the
+cases take turns for the given number of repeats; the median is
+reported. 'all engines' also imports the database engines and the
+cache, as models/__init__.py used to, and 'deferred' sets
+HBNB_DEFER_RELOAD=on. The slowest modules of the default case are
+listed with their -X importtime cumulative times.
+
+Usage: ./benchmarks/import_time.py [repeats] [file.json to reload]
+"""
+import os
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+TIMED = """import time
+start = time.perf_counter()
+{}
+print(time.perf_counter() - start)
+"""
+CASES = (
+    ('all engines', {}, 'import models, models.engine.db_storage, '
+     'models.engine.sqlite_storage, models.engine.cached_storage'),
+    ('selected engine', {}, 'import models'),
+    ('deferred', {'HBNB_DEFER_RELOAD': 'on'}, 'import models'),
+)
+
+
+def run(env, code, cwd, importtime=False):
+    """Runs code in a new interpreter, returns the CompletedProcess"""
+    environ = {k: v for k, v in os.environ.items()
+               if not k.startswith('HBNB_')}
+    environ.update(env)
+    environ['PYTHONPATH'] = ROOT
+    flags = ['-X', 'importtime'] if importtime else []
+    return subprocess.run([sys.executable] + flags + ['-c', code], cwd=cwd,
+                          env=environ, capture_output=True, text=True,
+                          check=True)
+
+
+if __name__ == "__main__":
+    repeats = int(sys.argv[1]) if len(sys.argv) > 1 else 10
+    cwd = tempfile.mkdtemp()
+    if len(sys.argv) > 2:
+        shutil.copy(sys.argv[2], os.path.join(cwd, 'file.json'))
+    times = {name: [] for name, _, _ in CASES}
+    for _ in range(repeats):
+        for name, env, code in CASES:
+            times[name].append(float(run(env, TIMED.format(code),
+                                         cwd).stdout))
+    for name, _, _ in CASES:
+        print("{:16s} {:8.1f} ms".format(
+            name, statistics.median(times[name]) * 1000))
+    lines = run({}, 'import models', cwd, True).stderr.splitlines()
+    modules = []
+    for line in lines[1:]:
+        _, cumulative, module = line[len('import time:'):].split('|')
+        modules.append((int(cumulative), module.strip()))
+    for cumulative, module in sorted(modules, reverse=True)[:10]:
+        print("{:40s} {:8.1f} ms".format(module, cumulative / 1000))
+    shutil.rmtree(cwd)
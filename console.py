@@ -1,9 +1,19 @@
 #!/usr/bin/python3
 """ Console Module """
 import cmd
+import cProfile
+import csv
+import json
+import os
+import pstats
 import sys
-from models.base_model import BaseModel
-from models.__init__ import storage
+import time
+import tracemalloc
+from itertools import islice
+from os import getenv
+from models.base_model import BaseModel, dependency_order, new_id
+import models.engine
+from models import storage
 from models.user import User
 from models.place import Place
 from models.state import State
@@ -12,6 +22,22 @@ from models.amenity import Amenity
 from models.review import Review
 
 
+class _ErrorRecorder:
+    """ Passes output through, keeping the last ** error ** printed """
+
+    def __init__(self, stream):
+        self.stream = stream
+        self.error = None
+
+    def write(self, text):
+        if text.startswith('** '):
+            self.error = text.strip()
+        return self.stream.write(text)
+
+    def flush(self):
+        self.stream.flush()
+
+
 class HBNBCommand(cmd.Cmd):
     """ Contains the functionality for the HBNB console"""
 
@@ -29,6 +55,8 @@ class HBNBCommand(cmd.Cmd):
              'max_guest': int, 'price_by_night': int,
              'latitude': float, 'longitude': float
             }
+    _batch = None  # transaction of the current batch, see do_batch
+    bulk_chunk = int(getenv('HBNB_BULK_CHUNK', '1000'))
 
     def preloop(self):
         """Prints if isatty is false"""
@@ -47,6 +75,10 @@ class HBNBCommand(cmd.Cmd):
         if not ('.' in line and '(' in line and ')' in line):
             return line
 
+        # profile reformats the command it wraps itself, see do_profile
+        if line.startswith('profile '):
+            return line
+
         try:  # parse line left to right
             pline = line[:]  # parsed line
 
@@ -60,7 +92,9 @@ class HBNBCommand(cmd.Cmd):
 
             # if parantheses contain arguments, parse them
             pline = pline[pline.find('(') + 1:pline.find(')')]
-            if pline:
+            if _cmd == 'all':  # key=value options, see do_all
+                _args = ' '.join(HBNBCommand._all_args(pline))
+            elif pline:
                 # partition args: (<id>, [<delim>], [<*args>])
                 pline = pline.partition(', ')  # pline convert to tuple
 
@@ -118,6 +152,330 @@ class HBNBCommand(cmd.Cmd):
 
 
 
+    def onecmd(self, line):
+        """Runs a command; inside a batch, counts it and reports errors
+
+        A command fails if it prints a ** message ** or raises. The
+        error is printed to stderr and the batch goes on.
+        """
+        if self._batch is None or \
+                line.split(' ')[0] in ('batch', 'profile'):
+            return super().onecmd(line)
+        stats = self._batch_stats
+        stats['commands'] += 1
+        recorder = _ErrorRecorder(sys.stdout)
+        stdout, sys.stdout = sys.stdout, recorder
+        try:
+            stop = super().onecmd(line)
+        except Exception as error:
+            recorder.error = '{}: {}'.format(type(error).__name__, error)
+            stop = False
+        finally:
+            sys.stdout = stdout
+        if recorder.error:
+            stats['errors'] += 1
+            print('#{} {}: {}'.format(stats['commands'], line.strip(),
+                                      recorder.error), file=sys.stderr)
+        return stop
+
+    def do_batch(self, args):
+        """ Groups commands into one storage transaction """
+        action = args.partition(' ')[0]
+        if action == 'begin':
+            if self._batch is not None:
+                print("** batch already begun **")
+                return
+            self._batch = storage.transaction()
+            self._batch.__enter__()
+            self._batch_stats = {'commands': 0, 'errors': 0,
+                                 'committed': False,
+                                 'start': time.perf_counter()}
+        elif action in ('commit', 'rollback'):
+            if self._batch is None:
+                print("** no batch begun **")
+                return
+            batch, self._batch = self._batch, None
+            stats = self._batch_stats
+            try:
+                if action == 'commit':
+                    batch.__exit__(None, None, None)
+                    stats['committed'] = True
+                else:
+                    error = RuntimeError('batch rollback')
+                    batch.__exit__(RuntimeError, error, None)
+            except Exception as error:
+                print("** batch failed, nothing saved: {} **".format(error))
+                action = 'rollback'
+            elapsed = time.perf_counter() - stats['start']
+            print("{}: {} commands, {} errors in {:.3f} s ({:.0f} commands/s)"
+                  .format(action, stats['commands'], stats['errors'], elapsed,
+                          stats['commands'] / elapsed if elapsed else 0),
+                  file=sys.stderr)
+        else:
+            print("** batch action missing: begin, commit or rollback **")
+
+    def help_batch(self):
+        """ Help information for the batch command """
+        print("Runs the following commands in one storage transaction,")
+        print("saved once at commit, and reports their errors and rate")
+        print("[Usage]: batch begin|commit|rollback\n")
+
+    def run_batch(self, path):
+        """Runs the commands of file path ('-' for stdin) as one batch
+
+        Reading stops at quit or EOF. An interruption rolls the batch
+        back. Returns its statistics: the number of commands and of
+        errors, and whether it was committed.
+        """
+        stream = sys.stdin if path == '-' else open(path)
+        try:
+            self.onecmd('batch begin')
+            stats = self._batch_stats
+            try:
+                for line in stream:
+                    line = line.strip()
+                    if line in ('quit', 'EOF'):
+                        break
+                    if line:
+                        self.onecmd(self.precmd(line))
+            except BaseException:
+                self.onecmd('batch rollback')
+                raise
+            self.onecmd('batch commit')
+        finally:
+            if stream is not sys.stdin:
+                stream.close()
+        return stats
+
+    def do_profile(self, args):
+        """ Runs a command under cProfile and tracemalloc, then reports """
+        options = {'top': '15', 'sort': 'cumulative', 'dump': None}
+        args = args.split(' ')
+        while args and args[0].partition('=')[0] in options and \
+                '=' in args[0]:
+            key, _, value = args.pop(0).partition('=')
+            options[key] = value
+        command = ' '.join(args).strip()
+        if not command:
+            print("** command missing **")
+            return
+        try:
+            top = int(options['top'])
+        except ValueError:
+            top = None
+        if top is None or \
+                options['sort'] not in pstats.Stats.sort_arg_dict_default:
+            print("** bad top or sort option **")
+            return
+
+        tracing = tracemalloc.is_tracing()
+        if not tracing:
+            tracemalloc.start()
+        tracemalloc.reset_peak()
+        before = tracemalloc.get_traced_memory()[0]
+        profile = cProfile.Profile()
+        start = time.perf_counter()
+        try:
+            return profile.runcall(self.onecmd, self.precmd(command))
+        finally:
+            elapsed = time.perf_counter() - start
+            current, peak = tracemalloc.get_traced_memory()
+            if not tracing:
+                tracemalloc.stop()
+            if options['dump']:
+                profile.dump_stats(options['dump'])
+            stats = pstats.Stats(profile, stream=sys.stdout)
+            print("wall time {:.6f} s, {} bytes allocated, {} bytes peak"
+                  .format(elapsed, current - before, peak - before))
+            calls = HBNBCommand._storage_calls(stats)
+            print("storage calls: " + (', '.join(
+                '{} {}'.format(name, count) for name, count in calls)
+                or 'none'))
+            stats.strip_dirs().sort_stats(options['sort']).print_stats(top)
+
+    def help_profile(self):
+        """ Help information for the profile command """
+        print("Runs a command under cProfile and tracemalloc and prints")
+        print("its wall time, the bytes it allocated, the calls it made")
+        print("to storage engine methods and its top hotspots; dump")
+        print("writes the pstats file for later analysis")
+        print("[Usage]: profile [top=<n>] [sort=<pstats key>] "
+              "[dump=<path>] <command>\n")
+
+    @staticmethod
+    def _storage_calls(stats):
+        """ Returns (engine.method, calls) of the public storage methods
+        in stats, most called first; each resume of a generator such as
+        stream() counts as one call
+        """
+        engine = os.path.dirname(os.path.abspath(models.engine.__file__))
+        calls = {}
+        for (path, _, name), (_, count, _, _, _) in stats.stats.items():
+            if os.path.dirname(os.path.abspath(path)) != engine or \
+                    name.startswith(('_', '<')):
+                continue
+            module = os.path.splitext(os.path.basename(path))[0]
+            key = '{}.{}'.format(module, name)
+            calls[key] = calls.get(key, 0) + count
+        return sorted(calls.items(), key=lambda item: (-item[1], item[0]))
+
+    def do_export(self, args):
+        """ Writes the objects of a class, or all, to a JSONL or CSV file """
+        args = args.split()
+        if not args:
+            print("** class name missing **")
+            return
+        if args[0] != 'all' and args[0] not in HBNBCommand.classes:
+            print("** class doesn't exist **")
+            return
+        if len(args) < 2:
+            print("** path missing **")
+            return
+        cls = HBNBCommand.classes.get(args[0])
+        start = time.perf_counter()
+        total = 0
+        with open(args[1], 'w', newline='') as stream:
+            if args[1].endswith('.csv'):
+                writer = csv.DictWriter(stream, HBNBCommand._csv_fields(cls),
+                                        extrasaction='ignore')
+                writer.writeheader()
+                write = writer.writerow
+            else:
+                def write(record):
+                    stream.write(json.dumps(record) + '\n')
+            for obj in storage.stream(cls, HBNBCommand.bulk_chunk):
+                write(HBNBCommand._record(obj))
+                total += 1
+        HBNBCommand._report('exported', total, start)
+
+    def help_export(self):
+        """ Help information for the export command """
+        print("Writes all objects of a class, or of every class, one per")
+        print("line to a JSON Lines file, or to a CSV file of the table")
+        print("columns if the path ends in .csv")
+        print("[Usage]: export <className>|all <path>\n")
+
+    def do_import(self, args):
+        """ Stores the records of a JSONL or CSV file, in chunks """
+        path = args.strip()
+        if not path:
+            print("** path missing **")
+            return
+        start = time.perf_counter()
+        chunks = {}
+        links = {}
+        total = line = 0
+        try:
+            with open(path, newline='') as stream, storage.transaction():
+                if path.endswith('.csv'):
+                    rows = csv.DictReader(stream)
+                    parse = HBNBCommand._csv_record
+                else:
+                    rows = (text for text in stream if text.strip())
+                    parse = json.loads
+                for line, row in enumerate(rows, 1):
+                    record = parse(row)
+                    cls = HBNBCommand.classes.get(record.get('__class__'))
+                    if cls is None:
+                        raise ValueError("class doesn't exist")
+                    if cls is Place:
+                        links[record.setdefault('id', new_id())] = \
+                            record.pop('amenity_ids', ())
+                    chunk = chunks.setdefault(cls, [])
+                    chunk.append(record)
+                    if len(chunk) >= HBNBCommand.bulk_chunk:
+                        total += HBNBCommand._store(chunks)
+                total += HBNBCommand._store(chunks)
+                for place_id, amenity_ids in links.items():
+                    storage.set_amenity_ids(place_id, amenity_ids)
+        except OSError as error:
+            print("** {} **".format(error))
+            return
+        except Exception as error:
+            print("** record {}: {}, nothing imported **".format(line, error))
+            return
+        HBNBCommand._report('imported', total, start)
+
+    def help_import(self):
+        """ Help information for the import command """
+        print("Stores the records of a file written by export, replacing")
+        print("the objects with the same id, HBNB_BULK_CHUNK at a time in")
+        print("one transaction: a bad record imports nothing. The")
+        print("amenities of the places are linked once all are stored")
+        print("[Usage]: import <path>\n")
+
+    @staticmethod
+    def _store(chunks):
+        """ Stores and empties the chunks of records of every class,
+        parents first so that foreign keys find their rows
+        """
+        total = 0
+        for cls in dependency_order(chunks):
+            if chunks[cls]:
+                total += storage.bulk_upsert(cls, chunks[cls])
+                chunks[cls].clear()
+        return total
+
+    @staticmethod
+    def _record(obj):
+        """ Returns to_dict() of obj without the related objects, with
+        the ids of the amenities of a place
+        """
+        record = {key: value for key, value in obj.to_dict().items()
+                  if not isinstance(value, (BaseModel, list))}
+        if isinstance(obj, Place):
+            amenity_ids = storage.amenity_ids(obj.id)
+            if amenity_ids:
+                record['amenity_ids'] = sorted(amenity_ids)
+        return record
+
+    @staticmethod
+    def _columns(cls):
+        """ Returns (name, python type) of the columns of cls, id and
+        timestamps first; only those for classes without a table
+        """
+        columns = [('id', str), ('created_at', str), ('updated_at', str)]
+        table = getattr(cls, '__table__', None)
+        if table is not None:
+            columns += [(column.name, column.type.python_type)
+                        for column in table.columns
+                        if column.name not in dict(columns)]
+        return columns
+
+    @staticmethod
+    def _csv_fields(cls=None):
+        """ Returns the CSV header of cls, or of every class """
+        fields = ['__class__']
+        for z_cls in [cls] if cls else HBNBCommand.classes.values():
+            for name, _ in HBNBCommand._columns(z_cls):
+                if name not in fields:
+                    fields.append(name)
+        return fields
+
+    @staticmethod
+    def _csv_record(row):
+        """ Returns the record of a CSV row, its numbers converted and its
+        empty fields dropped
+        """
+        cls = HBNBCommand.classes.get(row.get('__class__'))
+        record = {}
+        for name, python_type in HBNBCommand._columns(cls) if cls else []:
+            value = row.get(name)
+            if value is None or value == '':
+                continue
+            if python_type in (int, float):
+                value = python_type(value)
+            record[name] = value
+        record['__class__'] = row.get('__class__')
+        return record
+
+    @staticmethod
+    def _report(action, total, start):
+        """ Prints the number of objects moved and the rate """
+        elapsed = time.perf_counter() - start
+        print("{} {} objects in {:.3f} s ({:.0f} objects/s)".format(
+            action, total, elapsed, total / elapsed if elapsed else 0))
+
     def do_quit(self, command):
         """ Method to exit the HBNB console"""
         exit()
@@ -185,11 +543,11 @@ class HBNBCommand(cmd.Cmd):
             print("** instance id missing **")
             return
 
-        key = c_name + "." + c_id
-        try:
-            print(storage.all()[key])
-        except KeyError:
+        obj = storage.get(HBNBCommand.classes[c_name], c_id)
+        if obj is None:
             print("** no instance found **")
+        else:
+            print(obj)
 
     def help_show(self):
         """ Help information for the show command """
@@ -216,13 +574,12 @@ class HBNBCommand(cmd.Cmd):
             print("** instance id missing **")
             return
 
-        key = c_name + "." + c_id
-
-        try:
-            del(storage.all()[key])
-            storage.save()
-        except KeyError:
+        obj = storage.get(HBNBCommand.classes[c_name], c_id)
+        if obj is None:
             print("** no instance found **")
+            return
+        storage.delete(obj)
+        storage.save()
 
     def help_destroy(self):
         """ Help information for the destroy command """
@@ -230,34 +587,87 @@ class HBNBCommand(cmd.Cmd):
         print("[Usage]: destroy <className> <objectId>\n")
 
     def do_all(self, args):
-        """ Shows all objects, or all objects of a class"""
-        print_list = []
+        """ Shows all objects, or all objects of a class, one per line
 
-        if args:
-            args = args.split(' ')[0]  # remove possible trailing args
-            if args not in HBNBCommand.classes:
-                print("** class doesn't exist **")
-                return
-            for k, v in storage.all(HBNBCommand.classes[args]).items():
-                if k.split('.')[0] == args:
-                    print_list.append(str(v))
-        else:
-            for k, v in storage.all(HBNBCommand.classes[args]).items():
-                print_list.append(str(v))
+        Objects are read from storage.stream() and printed as they come,
+        limit and offset select a page of them and fields projects each
+        object on some of its attributes.
+        """
+        args = args.split()
+        c_name = args.pop(0) if args and '=' not in args[0] else ''
+        if c_name and c_name not in HBNBCommand.classes:
+            print("** class doesn't exist **")
+            return
+        options = {}
+        for arg in args:
+            key, _, value = arg.partition('=')
+            options[key] = value.strip('"')
+        try:
+            limit = options.pop('limit', None)
+            limit = None if limit is None else int(limit)
+            offset = int(options.pop('offset', 0))
+            if (limit or 0) < 0 or offset < 0:
+                raise ValueError
+        except ValueError:
+            print("** limit and offset must be positive integers **")
+            return
+        fields = [name for name in options.pop('fields', '').split(',')
+                  if name]
+        if options:
+            print("** unknown option: {} **".format(', '.join(options)))
+            return
+
+        objs = storage.stream(HBNBCommand.classes.get(c_name),
+                              HBNBCommand.bulk_chunk)
+        if c_name:  # subclasses are listed under their own name
+            objs = (obj for obj in objs if type(obj).__name__ == c_name)
+        stop = None if limit is None else offset + limit
+        for obj in islice(objs, offset, stop):
+            if fields:
+                print('[{}] ({}) {}'.format(
+                    type(obj).__name__, obj.id,
+                    {name: getattr(obj, name, None) for name in fields}))
+            else:
+                print(obj)
 
-        print(print_list)
+    @staticmethod
+    def _all_args(args):
+        """ Returns the arguments of <class name>.all(...) for do_all
+
+        key=value pairs are separated by commas, the names listed in a
+        fields value too: (limit=50, fields=name, id) gives
+        ['limit=50', 'fields=name,id'].
+        """
+        parsed = []
+        for arg in args.split(','):
+            arg = arg.strip()
+            if '=' in arg or not parsed:
+                parsed.append(arg.replace(' ', ''))
+            elif arg:
+                parsed[-1] += ',' + arg
+        return [arg for arg in parsed if arg]
 
     def help_all(self):
         """ Help information for the all command """
-        print("Shows all objects, or all of a class")
-        print("[Usage]: all <className>\n")
+        print("Shows all objects, or all of a class, one per line;")
+        print("limit and offset page them, fields selects attributes")
+        print("[Usage]: all [<className>] [limit=<n>] [offset=<n>] "
+              "[fields=<name>,...]")
+        print("[Usage]: <className>.all([limit=<n>, offset=<n>, "
+              "fields=<name>, ...])\n")
 
     def do_count(self, args):
-        """Count current number of class instances"""
+        """Count current number of class instances
+
+        Like all, only objects of exactly that class are counted:
+        storage.count() includes subclasses, so theirs are subtracted.
+        """
         count = 0
-        for k, v in storage.all().items():
-            if args == k.split('.')[0]:
-                count += 1
+        if args in HBNBCommand.classes:
+            cls = HBNBCommand.classes[args]
+            count = storage.count(cls) - sum(
+                storage.count(sub) for sub in HBNBCommand.classes.values()
+                if sub is not cls and issubclass(sub, cls))
         print(count)
 
     def help_count(self):
@@ -287,11 +697,9 @@ class HBNBCommand(cmd.Cmd):
             print("** instance id missing **")
             return
 
-        # generate key from class and id
-        key = c_name + "." + c_id
-
-        # determine if key is present
-        if key not in storage.all():
+        # look the object up by class and id
+        new_dict = storage.get(HBNBCommand.classes[c_name], c_id)
+        if new_dict is None:
             print("** no instance found **")
             return
 
@@ -324,9 +732,6 @@ class HBNBCommand(cmd.Cmd):
 
             args = [att_name, att_val]
 
-        # retrieve dictionary of current objects
-        new_dict = storage.all()[key]
-
         # iterate through attr names and values
         for i, att_name in enumerate(args):
             # block only runs on even iterations
@@ -342,8 +747,8 @@ class HBNBCommand(cmd.Cmd):
                 if att_name in HBNBCommand.types:
                     att_val = HBNBCommand.types[att_name](att_val)
 
-                # update dictionary with name, value pair
-                new_dict.__dict__.update({att_name: att_val})
+                # set the attribute so storage sees the change
+                setattr(new_dict, att_name, att_val)
 
         new_dict.save()  # save updates to file
 
@@ -353,4 +758,7 @@ class HBNBCommand(cmd.Cmd):
         print("Usage: update <className> <id> <attName> <attVal>\n")
 
 if __name__ == "__main__":
+    if len(sys.argv) == 3 and sys.argv[1] == '--batch':
+        stats = HBNBCommand().run_batch(sys.argv[2])
+        sys.exit(0 if stats['committed'] and not stats['errors'] else 1)
     HBNBCommand().cmdloop()
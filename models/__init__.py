@@ -1,14 +1,38 @@
 #!/usr/bin/python3
-"""This module instantiates an object of class FileStorage"""
-from models.engine.file_storage import FileStorage
-from models.engine.db_storage import DBStorage
+"""This module instantiates the storage engine selected by the environment
+
+HBNB_TYPE_STORAGE picks the engine ('db', 'sqlite', or FileStorage by
+default) and only that engine's module is imported. HBNB_CACHE_SIZE
+wraps it in a CachedStorage. With HBNB_DEFER_RELOAD=on the engine is
+created and reloaded on first use instead of at import.
+"""
 from os import getenv
 
 
-if getenv("HBNB_TYPE_STORAGE") == 'db':
-    storage = DBStorage()
+def create_storage():
+    """Returns a new, not yet reloaded, instance of the selected engine"""
+    if getenv("HBNB_TYPE_STORAGE") == 'db':
+        from models.engine.db_storage import DBStorage
+        engine = DBStorage()
 
-else:
-    storage = FileStorage()
+    elif getenv("HBNB_TYPE_STORAGE") == 'sqlite':
+        from models.engine.sqlite_storage import SQLiteStorage
+        engine = SQLiteStorage()
+
+    else:
+        from models.engine.file_storage import FileStorage
+        engine = FileStorage()
+
+    if int(getenv("HBNB_CACHE_SIZE", "0")) > 0:
+        from models.engine.cached_storage import CachedStorage
+        engine = CachedStorage(engine, int(getenv("HBNB_CACHE_SIZE")))
+    return engine
 
-storage.reload()
+
+if getenv("HBNB_DEFER_RELOAD") == 'on':
+    from models.engine.deferred_storage import DeferredStorage
+    storage = DeferredStorage(create_storage)
+
+else:
+    storage = create_storage()
+    storage.reload()
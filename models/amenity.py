@@ -9,5 +9,5 @@ class Amenity(BaseModel):
     __tablename__ = "amenities"
     name = Column(String(128), nullable=False)
 
-    if getenv('HBNB_TYPE_STORAGE') == 'db':
+    if getenv('HBNB_TYPE_STORAGE') in ('db', 'sqlite'):
         place_amenities = relationship("Place", secondary="place_amenity", back_populates="amenities")
@@ -1,17 +1,63 @@
 #!/usr/bin/python3
 """This module defines a base class for all models in our hbnb clone"""
+import os
+import threading
+import time
 import uuid
 from datetime import datetime
-from sqlalchemy import Column, String, DateTime
-from sqlalchemy.orm import declarative_base
+from sqlalchemy import Column, String, DateTime, inspect
+from sqlalchemy.orm import declarative_base, configure_mappers
 
 Base = declarative_base()
 
+# 'uuid4' (random) or 'uuid7' (time ordered) ids for new objects
+ID_FORMAT = os.getenv('HBNB_ID_FORMAT', 'uuid4')
+_uuid7_lock = threading.Lock()
+_uuid7_last = [0, 0]  # [milliseconds, counter] of the last uuid7
+
+
+def uuid7():
+    """Returns a version 7 UUID: 48 bits of Unix time in milliseconds,
+    a 12 bit counter and 62 random bits
+
+    Ids made by this process sort in the order they were made, also
+    within one millisecond, so inserts land at the end of an index.
+    """
+    with _uuid7_lock:
+        ms = time.time_ns() // 1000000
+        if ms > _uuid7_last[0]:
+            _uuid7_last[0], _uuid7_last[1] = ms, 0
+        else:
+            _uuid7_last[1] += 1
+            if _uuid7_last[1] > 0xfff:
+                _uuid7_last[0], _uuid7_last[1] = _uuid7_last[0] + 1, 0
+        ms, counter = _uuid7_last
+    rand = int.from_bytes(os.urandom(8), 'big') & ((1 << 62) - 1)
+    return uuid.UUID(int=(ms << 80) | (0x7 << 76) | (counter << 64) |
+                     (0b10 << 62) | rand)
+
+
+def new_id():
+    """Returns the id string of a new object, in the HBNB_ID_FORMAT"""
+    if ID_FORMAT == 'uuid7':
+        return str(uuid7())
+    return str(uuid.uuid4())
+
+
+def dependency_order(classes):
+    """Returns classes sorted so that the tables their foreign keys
+    refer to come first; classes without a table come before all others
+    """
+    tables = Base.metadata.sorted_tables
+    return sorted(classes, key=lambda cls: tables.index(cls.__table__)
+                  if hasattr(cls, '__table__') else -1)
+
+
 class BaseModel(Base):
     """A base class for all hbnb models"""
     __abstract__ = True
 
-    id = Column(String(60), primary_key=True, nullable=False, default=uuid.uuid4)
+    id = Column(String(60), primary_key=True, nullable=False, default=new_id)
     created_at = Column(DateTime, nullable=False, default=datetime.utcnow)
     updated_at = Column(DateTime, nullable=False, default=datetime.utcnow)
     
@@ -19,34 +65,85 @@ class BaseModel(Base):
         """Instatntiates a new model"""
         if not kwargs:
             from models import storage
-            self.id = str(uuid.uuid4())
+            self.id = new_id()
             self.created_at = datetime.utcnow()
             self.updated_at = datetime.utcnow()
         else:
             try:
-                kwargs['updated_at'] = datetime.strptime(kwargs['updated_at'],
-                                                     '%Y-%m-%dT%H:%M:%S.%f')
+                kwargs['updated_at'] = datetime.fromisoformat(
+                    kwargs['updated_at'])
             except KeyError:
                 self.updated_at = datetime.utcnow()
             try:
-                kwargs['created_at'] = datetime.strptime(kwargs['created_at'],
-                                                     '%Y-%m-%dT%H:%M:%S.%f')
+                kwargs['created_at'] = datetime.fromisoformat(
+                    kwargs['created_at'])
             except KeyError:
                 self.created_at = datetime.utcnow()
             try:
                 kwargs['id']
             except KeyError:
-                self.id = str(uuid.uuid4())
+                self.id = new_id()
             try:
                 del kwargs['__class__']
             except KeyError:
                 pass
             self.__dict__.update(kwargs)
 
+    def __setattr__(self, name, value):
+        """Sets an attribute and flags the instance as modified"""
+        super().__setattr__(name, value)
+        if name == '_sa_instance_state':
+            return
+        from models import storage
+        storage.touch(self, name)
+
+    @classmethod
+    def from_records(cls, records):
+        """Returns a list of cls objects built from records, dictionaries
+        as made by to_dict(), much faster than cls(**record) for each
+
+        __init__ and __setattr__ are skipped: the SQLAlchemy state is
+        created directly and the values go straight into __dict__, so
+        storage is not told about the objects; the caller adds them.
+        """
+        mapper = inspect(cls, raiseerr=False)
+        if mapper is not None:
+            if not mapper.configured:
+                configure_mappers()
+            new_instance = mapper.class_manager.new_instance
+        else:
+            def new_instance():
+                return object.__new__(cls)
+        parse = datetime.fromisoformat
+        objs = []
+        for record in records:
+            values = dict(record)
+            values.pop('__class__', None)
+            value = values.get('created_at')
+            if type(value) is str:
+                values['created_at'] = parse(value)
+            elif value is None:
+                values['created_at'] = datetime.utcnow()
+            value = values.get('updated_at')
+            if type(value) is str:
+                values['updated_at'] = parse(value)
+            elif value is None:
+                values['updated_at'] = datetime.utcnow()
+            if 'id' not in values:
+                values['id'] = new_id()
+            obj = new_instance()
+            obj._set_record(values)
+            objs.append(obj)
+        return objs
+
+    def _set_record(self, values):
+        """Stores the parsed values of a record, see from_records"""
+        self.__dict__.update(values)
+
     def __str__(self):
         """Returns a string representation of the instance"""
-        cls = (str(type(self)).split('.')[-1]).split('\'')[0]
-        return '[{}] ({}) {}'.format(cls, self.id, self.__dict__)
+        return '[{}] ({}) {}'.format(type(self).__name__, self.id,
+                                     self.__dict__)
 
     def save(self):
         """Updates updated_at with current time when instance is changed"""
@@ -57,16 +154,13 @@ class BaseModel(Base):
 
     def to_dict(self):
         """Convert instance into dict format"""
-        dictionary = {}
-        dictionary.update(self.__dict__)
-        dictionary.update({'__class__':
-                          (str(type(self)).split('.')[-1]).split('\'')[0]})
-        dictionary['created_at'] = self.created_at.isoformat()
-        dictionary['updated_at'] = self.updated_at.isoformat()
-        try:
-            del dictionary["_sa_instance_state"]
-        except:
-            pass
+        dictionary = self.__dict__.copy()
+        dictionary.pop('_sa_instance_state', None)
+        dictionary['__class__'] = type(self).__name__
+        dictionary['created_at'] = (dictionary.get('created_at') or
+                                    self.created_at).isoformat()
+        dictionary['updated_at'] = (dictionary.get('updated_at') or
+                                    self.updated_at).isoformat()
         return dictionary
     def delete(self):
         """ delete object
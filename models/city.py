@@ -12,6 +12,6 @@ class City(BaseModel):
     state_id = Column(String(60), ForeignKey("states.id"), nullable=False)
     name = Column(String(128), nullable=False)
 
-    if getenv('HBNB_TYPE_STORAGE') == 'db':
+    if getenv('HBNB_TYPE_STORAGE') in ('db', 'sqlite'):
         state = relationship("State", back_populates="cities")
         places = relationship("Place", back_populates="city", cascade="all, delete, delete-orphan")
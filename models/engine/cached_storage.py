@@ -0,0 +1,255 @@
+#!/usr/bin/python3
+"""This module defines a result cache wrapping any storage engine"""
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
+
+
+class CachedStorage:
+    """Memoizes all(cls) and query() results of the storage it wraps
+
+    At most size results are kept, the least recently used is evicted
+    first. Every class name has a version, bumped by new(), touch() and
+    delete() on its objects (and on those of its subclasses) and by the
+    bulk methods, once the wrapped storage has applied the change. A
+    cached result is only returned while the versions of the classes it
+    was built from are unchanged. rollback(), and a reload() or close()
+    that read from file (see FileStorage.reload_count), invalidate
+    every result.
+    cache_stats() returns the hit and miss counts.
+
+    A storage with detach() and attach(), such as DBStorage, returns
+    objects bound to the session of the calling thread, which its
+    commit expires and close() detaches. The cache keeps the copies
+    detach() makes, that belong to no session, and a hit returns them
+    attach()ed to the session of the caller, so results outlive
+    close(). Changes to relationship collections do not go through
+    touch(), so for such a storage save() and the end of a transaction
+    invalidate every result.
+    Every other method is passed to the wrapped storage unchanged.
+    """
+
+    def __init__(self, storage, size=256):
+        """Wraps storage, keeping at most size results"""
+        self.__storage = storage
+        self.__size = size
+        self.__sessions = hasattr(storage, 'detach')
+        self.__entries = OrderedDict()
+        self.__versions = {}
+        self.__epoch = 0
+        self.__lock = threading.Lock()
+        self.__stats = {'hits': 0, 'misses': 0, 'evictions': 0}
+
+    def __getattr__(self, name):
+        """Forwards everything else to the wrapped storage"""
+        return getattr(self.__storage, name)
+
+    def all(self, cls=None):
+        """Returns all(cls) of the wrapped storage, cached when cls is set
+
+        The dictionary returned is a copy the caller may modify.
+        """
+        if not cls:
+            return self.__storage.all()
+        return self.__cached(('all', cls), (cls,),
+                             lambda: self.__storage.all(cls)).copy()
+
+    def query(self, cls, where=None, order_by=None, limit=None, offset=0,
+              load=None):
+        """Returns query() of the wrapped storage, cached
+
+        The result depends on cls and on the classes reached by the load
+        paths. Calls whose arguments cannot be hashed are not cached.
+        """
+        if isinstance(order_by, list):
+            order_by = tuple(order_by)
+        if isinstance(load, list):
+            load = tuple(load)
+        key = ('query', cls, tuple(sorted((where or {}).items())),
+               order_by, limit, offset, load)
+        try:
+            hash(key)
+        except TypeError:
+            return self.__storage.query(cls, where, order_by, limit,
+                                        offset, load)
+        classes = (cls,) + self.__load_classes(cls, load)
+        return list(self.__cached(key, classes, lambda: self.__storage.query(
+            cls, where, order_by, limit, offset, load)))
+
+    def new(self, obj):
+        """Adds obj to the wrapped storage"""
+        try:
+            self.__storage.new(obj)
+        finally:
+            self.__bump(type(obj))
+
+    def touch(self, obj, name=None):
+        """Flags obj as modified in the wrapped storage
+
+        Private attributes, such as the _sa_instance_state SQLAlchemy
+        sets on the objects it loads, do not make results stale.
+        """
+        try:
+            self.__storage.touch(obj, name)
+        finally:
+            if not (name or '').startswith('_'):
+                self.__bump(type(obj))
+
+    def delete(self, obj=None):
+        """Deletes obj from the wrapped storage"""
+        try:
+            self.__storage.delete(obj)
+        finally:
+            if obj is not None:
+                self.__bump(type(obj))
+
+    def bulk_new(self, objs, chunk_size=None):
+        """Adds many objects to the wrapped storage"""
+        objs = list(objs)
+        try:
+            return self.__storage.bulk_new(objs, chunk_size)
+        finally:
+            for cls in {type(obj) for obj in objs}:
+                self.__bump(cls)
+
+    def bulk_upsert(self, cls, rows, chunk_size=None):
+        """Stores rows of cls in the wrapped storage"""
+        try:
+            return self.__storage.bulk_upsert(cls, rows, chunk_size)
+        finally:
+            self.__bump(cls)
+
+    @contextmanager
+    def transaction(self):
+        """Runs the block in a transaction of the wrapped storage"""
+        try:
+            with self.__storage.transaction():
+                yield self
+        except BaseException:
+            self.cache_clear()
+            raise
+        if self.__sessions:
+            self.cache_clear()
+
+    def save(self):
+        """Saves the wrapped storage"""
+        try:
+            self.__storage.save()
+        finally:
+            if self.__sessions:
+                self.cache_clear()
+
+    def rollback(self):
+        """Discards the unsaved changes of the wrapped storage"""
+        self.__storage.rollback()
+        self.cache_clear()
+
+    def reload(self):
+        """Reloads the wrapped storage"""
+        before = self.__reload_count()
+        self.__storage.reload()
+        if self.__reload_count() != before:
+            self.cache_clear()
+
+    def close(self):
+        """Closes the wrapped storage"""
+        before = self.__reload_count()
+        self.__storage.close()
+        if self.__reload_count() != before:
+            self.cache_clear()
+
+    def cache_clear(self):
+        """Invalidates every cached result"""
+        with self.__lock:
+            self.__epoch += 1
+            self.__entries.clear()
+
+    def cache_stats(self):
+        """Returns the hits, misses, evictions, size and maxsize"""
+        with self.__lock:
+            stats = dict(self.__stats)
+            stats['size'] = len(self.__entries)
+        stats['maxsize'] = self.__size
+        return stats
+
+    def __cached(self, key, classes, compute):
+        """Returns the result stored under key, computing it if stale"""
+        names = tuple(cls.__name__ for cls in classes)
+        with self.__lock:
+            version = (self.__epoch,) + tuple(self.__versions.get(name, 0)
+                                              for name in names)
+            entry = self.__entries.get(key)
+            if entry is not None and entry[0] == version:
+                self.__entries.move_to_end(key)
+                self.__stats['hits'] += 1
+            else:
+                entry = None
+                self.__stats['misses'] += 1
+        if entry is not None:
+            return self.__attach(entry[1])
+        result = compute()
+        stored = self.__detach(result)
+        with self.__lock:
+            if stored is not None and (self.__epoch,) + tuple(
+                    self.__versions.get(name, 0)
+                    for name in names) == version:
+                self.__entries[key] = (version, stored)
+                self.__entries.move_to_end(key)
+                while len(self.__entries) > self.__size:
+                    self.__entries.popitem(last=False)
+                    self.__stats['evictions'] += 1
+        return result
+
+    def __detach(self, result):
+        """Returns what to cache of result, None to not cache it"""
+        if not self.__sessions:
+            return result
+        if isinstance(result, dict):
+            objs = self.__storage.detach(list(result.values()))
+            return None if objs is None else dict(zip(result, objs))
+        return self.__storage.detach(result)
+
+    def __attach(self, stored):
+        """Returns the result to hand out for what __detach cached"""
+        if not self.__sessions:
+            return stored
+        if isinstance(stored, dict):
+            return dict(zip(stored, self.__storage.attach(
+                list(stored.values()))))
+        return self.__storage.attach(stored)
+
+    def __reload_count(self):
+        """Returns the reload_count() of the wrapped storage, if any"""
+        reload_count = getattr(self.__storage, 'reload_count', None)
+        return reload_count() if reload_count else None
+
+    def __bump(self, cls):
+        """Makes the results built from cls and its bases stale"""
+        with self.__lock:
+            for base in cls.__mro__:
+                name = base.__name__
+                self.__versions[name] = self.__versions.get(name, 0) + 1
+
+    @staticmethod
+    def __load_classes(cls, load):
+        """Returns the classes reached by the load paths from cls
+
+        Paths that are not SQLAlchemy relationships are skipped: such
+        relationships are read live from storage, not from the result.
+        A loader option object may reach anything, so it adds object,
+        the base of every class.
+        """
+        if isinstance(load, str):
+            load = (load,)
+        classes = ()
+        for path in load or ():
+            if not isinstance(path, str):
+                return classes + (object,)
+            owner = cls
+            for name in path.split('.'):
+                try:
+                    owner = getattr(owner, name).property.mapper.class_
+                except AttributeError:
+                    break
+                classes += (owner,)
+        return classes
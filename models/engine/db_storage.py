@@ -1,22 +1,144 @@
 #!/usr/bin/python3
 """ new class for sqlAlchemy """
-from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker, scoped_session
+import pickle
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime
+from collections.abc import Mapping
+from itertools import cycle, islice
+from sqlalchemy import (create_engine, func, literal, select, union_all,
+                        DateTime, inspect)
+from sqlalchemy.exc import TimeoutError as PoolTimeout
+from sqlalchemy.pool import QueuePool
+from sqlalchemy.orm import (sessionmaker, scoped_session, selectinload,
+                            Session, make_transient_to_detached)
 from os import getenv
-from models.base_model import BaseModel, Base
+from models.base_model import BaseModel, Base, new_id, dependency_order
 
 from models.user import User
-from models.place import Place
+from models.place import Place, place_amenity
 from models.state import State
 from models.city import City
 from models.amenity import Amenity
 from models.review import Review
 
 
+class _LazyObjects(Mapping):
+    """ read-only {key: obj} mapping over rows whose keys are known
+
+    The objects of a class are loaded, all at once, the first time one
+    of its keys is looked up, so iterating keys or counting them costs
+    no query and classes that are never read are never loaded.
+    """
+
+    def __init__(self, keys, load):
+        """keys is {cls: [id, ...]}, load(cls) returns the cls rows"""
+        self.__keys = {}
+        for cls, ids in keys.items():
+            for obj_id in ids:
+                self.__keys[cls.__name__ + '.' + obj_id] = cls
+        self.__load = load
+        self.__objects = {}
+
+    def __getitem__(self, key):
+        cls = self.__keys[key]
+        objs = self.__objects.get(cls)
+        if objs is None:
+            objs = self.__objects[cls] = {
+                cls.__name__ + '.' + obj.id: obj for obj in self.__load(cls)}
+        return objs[key]
+
+    def __iter__(self):
+        return iter(self.__keys)
+
+    def __len__(self):
+        return len(self.__keys)
+
+    def __contains__(self, key):
+        return key in self.__keys
+
+
+class _MeteredPool:
+    """ pool mixin counting checkouts and timing how long they wait
+
+    metrics holds the number of checkouts, the connections in use now
+    and at most, the total and longest wait in seconds, and the number
+    of checkouts that timed out.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.metrics = {'checkouts': 0, 'in_use': 0, 'peak_in_use': 0,
+                        'wait_time': 0.0, 'max_wait': 0.0, 'timeouts': 0}
+        self.__lock = threading.Lock()
+
+    def _do_get(self):
+        start = time.perf_counter()
+        try:
+            conn = super()._do_get()
+        except PoolTimeout:
+            with self.__lock:
+                self.metrics['timeouts'] += 1
+            raise
+        wait = time.perf_counter() - start
+        with self.__lock:
+            metrics = self.metrics
+            metrics['checkouts'] += 1
+            metrics['in_use'] += 1
+            metrics['peak_in_use'] = max(metrics['peak_in_use'],
+                                         metrics['in_use'])
+            metrics['wait_time'] += wait
+            metrics['max_wait'] = max(metrics['max_wait'], wait)
+        return conn
+
+    def _do_return_conn(self, record):
+        with self.__lock:
+            self.metrics['in_use'] -= 1
+        super()._do_return_conn(record)
+
+
+class _MeteredQueuePool(_MeteredPool, QueuePool):
+    """ QueuePool with checkout metrics """
+
+
+class _RoutingSession(Session):
+    """ session reading from the replicas, in turn, and writing to the
+    primary
+
+    Once the session has flushed or run an INSERT, UPDATE or DELETE it
+    reads from the primary as well, so it always sees its own writes.
+    """
+
+    def __init__(self, primary, replicas, **kwargs):
+        """replicas is an iterator cycling over the replica engines"""
+        super().__init__(**kwargs)
+        self.__primary = primary
+        self.__replicas = replicas
+
+    def get_bind(self, mapper=None, clause=None, **kwargs):
+        if self._flushing or getattr(clause, 'is_dml', False):
+            self.info['wrote'] = True
+        if self.info.get('wrote'):
+            return self.__primary
+        return next(self.__replicas)
+
+
 class DBStorage:
-    """ create tables in environmental"""
+    """ create tables in environmental
+
+    Each thread gets its own session from a scoped_session registry;
+    close() ends the session of the calling thread, so a threaded web
+    server serves each request with its own session. The MySQL pool is
+    sized by HBNB_POOL_SIZE, HBNB_POOL_MAX_OVERFLOW, HBNB_POOL_RECYCLE
+    and HBNB_POOL_TIMEOUT, and pool_stats() reports its usage.
+
+    With HBNB_MYSQL_REPLICAS=<host>,<host>... reads go to those read
+    replicas in turn (see _RoutingSession) and writes to the primary.
+    """
     __engine = None
     __session = None
+    __bulk_chunk = int(getenv('HBNB_BULK_CHUNK', '1000'))
 
     classes = {
                'BaseModel': BaseModel, 'User': User, 'Place': Place,
@@ -25,48 +147,330 @@ class DBStorage:
               }
     
     def __init__(self):
+        env = getenv("HBNB_ENV")
+
+        self.__local = threading.local()
+        self.__engine = self._create_engine()
+        self.__replicas = [self._create_engine(location)
+                           for location in self._replica_locations()]
+
+        if env == 'test':
+            Base.metadata.drop_all(self.__engine)
+
+    def _create_engine(self, host=None):
+        """build the engine of the primary, or of the replica on host,
+        overridden by engines on other databases
+        """
         user = getenv("HBNB_MYSQL_USER")
         passwd = getenv("HBNB_MYSQL_PWD")
         db = getenv("HBNB_MYSQL_DB")
-        host = getenv("HBNB_MYSQL_HOST")
-        env = getenv("HBNB_ENV")
+        host = host or getenv("HBNB_MYSQL_HOST")
 
-        self.__engine = create_engine('mysql+mysqldb://{}:{}@{}/{}'
-                                      .format(user, passwd, host, db),
-                                      pool_pre_ping=True)
+        return create_engine('mysql+mysqldb://{}:{}@{}/{}'
+                             .format(user, passwd, host, db),
+                             pool_pre_ping=True,
+                             poolclass=_MeteredQueuePool,
+                             **self._pool_options())
 
-        if env == 'test':
-            Base.metadata.drop_all()
+    @staticmethod
+    def _replica_locations():
+        """returns the replica hosts listed in HBNB_MYSQL_REPLICAS
+        """
+        return [host.strip()
+                for host in getenv('HBNB_MYSQL_REPLICAS', '').split(',')
+                if host.strip()]
 
+    @staticmethod
+    def _pool_options():
+        """returns the QueuePool settings read from the environment
+        """
+        return {
+                'pool_size': int(getenv('HBNB_POOL_SIZE', '5')),
+                'max_overflow': int(getenv('HBNB_POOL_MAX_OVERFLOW', '10')),
+                'pool_recycle': int(getenv('HBNB_POOL_RECYCLE', '3600')),
+                'pool_timeout': float(getenv('HBNB_POOL_TIMEOUT', '30'))
+               }
+
+    def pool_stats(self):
+        """returns the checkout metrics and status of the connection pool
+        """
+        pool = self.__engine.pool
+        stats = dict(getattr(pool, 'metrics', {}))
+        stats['status'] = pool.status()
+        return stats
 
     def all(self, cls=None):
         """returns a dictionary
         Return:
-            returns a dictionary of __object
+            returns a dictionary of __object; without cls, a read-only
+            mapping that loads each class on first use (_LazyObjects)
         """
+        if not cls:
+            return self.__all_keys()
         dic_of_obj = {}
-        if cls:
-            list_of_obj = self.__session.query(cls).all()
-        else:
-            list_of_obj = []
-            for z_cls in DBStorage.classes.values():
-                list_of_obj.extend(self.__session.query(z_cls))
+        list_of_obj = self.__session.query(cls).all()
         for obj in list_of_obj:
             key = type(obj).__name__ + '.' + obj.id
             dic_of_obj[key] = obj
 
         return dic_of_obj
-    
+
+    def __all_keys(self):
+        """returns every row of every table, fetching only the keys in a
+        single UNION ALL query; objects are loaded by class on first use
+        """
+        mapped = {z_cls.__name__: z_cls
+                  for z_cls in DBStorage.classes.values()
+                  if hasattr(z_cls, '__table__')}
+        self.__session.flush()
+        rows = self.__session.execute(union_all(*[
+            select(literal(name).label('cls'), z_cls.__table__.c.id)
+            for name, z_cls in mapped.items()]))
+        keys = {}
+        for name, obj_id in rows:
+            keys.setdefault(mapped[name], []).append(obj_id)
+        return _LazyObjects(keys, lambda z_cls:
+                            self.__session.query(z_cls).all())
+
+    def get(self, cls, id):
+        """returns the cls row with this primary key, or None; classes
+        without a table, such as BaseModel, have no rows
+        """
+        if not hasattr(cls, '__table__'):
+            return None
+        return self.__session.get(cls, id)
+
+    def count(self, cls=None):
+        """returns the number of cls rows via COUNT(*); without a table
+        (no cls, or BaseModel), the rows of the tables of its subclasses
+        """
+        if hasattr(cls, '__table__'):
+            return self.__session.query(func.count(cls.id)).scalar()
+        return sum(self.count(z_cls) for z_cls in DBStorage.classes.values()
+                   if hasattr(z_cls, '__table__') and
+                   (cls is None or issubclass(z_cls, cls)))
+
+    def stream(self, cls=None, chunk_size=None):
+        """yield the cls rows, or the rows of every table in foreign key
+        order, fetched chunk_size (default HBNB_BULK_CHUNK) at a time from
+        a server side cursor, so that only one chunk is held in memory;
+        a cls without a table (BaseModel) yields the rows of its subclasses
+        """
+        chunk_size = chunk_size or DBStorage.__bulk_chunk
+        classes = [cls] if hasattr(cls, '__table__') else dependency_order(
+            [z_cls for z_cls in DBStorage.classes.values()
+             if hasattr(z_cls, '__table__') and
+             (cls is None or issubclass(z_cls, cls))])
+        for z_cls in classes:
+            yield from self.__session.query(z_cls).yield_per(chunk_size)
+
+    def query(self, cls, where=None, order_by=None, limit=None, offset=0,
+              load=None):
+        """returns the list of cls rows matching where, sorted
+
+        where is a dict of column values, order_by a column name or a
+        list of them ('-' prefixed for descending); filtering, sorting
+        and paging all run in SQL.
+
+        load lists the relationships to load with the rows, as dotted
+        paths ('reviews.user') loaded with one SELECT ... IN per level,
+        or as SQLAlchemy loader options (joinedload(Place.user)).
+        """
+        query = self.__session.query(cls)
+        if isinstance(load, str):
+            load = [load]
+        for path in load or []:
+            query = query.options(self.__loader(cls, path)
+                                  if isinstance(path, str) else path)
+        if where:
+            query = query.filter_by(**where)
+        if isinstance(order_by, str):
+            order_by = [order_by]
+        for name in order_by or []:
+            column = getattr(cls, name.lstrip('-'))
+            query = query.order_by(column.desc() if name[0] == '-'
+                                   else column)
+        if offset:
+            query = query.offset(offset)
+        if limit is not None:
+            query = query.limit(limit)
+        return query.all()
+
+    @staticmethod
+    def __loader(cls, path):
+        """returns the selectinload option for the dotted path from cls
+        """
+        option = None
+        for name in path.split('.'):
+            attr = getattr(cls, name)
+            option = selectinload(attr) if option is None \
+                else option.selectinload(attr)
+            cls = attr.property.mapper.class_
+        return option
+
     def new(self, obj):
         """add a new element in the table
         """
         self.__session.add(obj)
 
 
+    def bulk_new(self, objs, chunk_size=None):
+        """insert many objects with one executemany per chunk and class
+
+        Only the columns are written, relationships are not followed;
+        classes are inserted in foreign key order, parents first. The
+        objects are then added to the session as persistent, so they
+        can be changed and saved like loaded ones; the columns they did
+        not set are read back when first used. Returns the number of
+        rows inserted.
+        """
+        by_class = {}
+        for obj in objs:
+            by_class.setdefault(type(obj), []).append(obj)
+        total = 0
+        for cls in dependency_order(by_class):
+            table = cls.__table__
+            total += self.__execute(table.insert(), table,
+                                    [obj.__dict__ for obj in by_class[cls]],
+                                    chunk_size)
+            for obj in by_class[cls]:
+                make_transient_to_detached(obj)
+            self.__session.add_all(by_class[cls])
+        self.save()
+        return total
+
+    def bulk_upsert(self, cls, rows, chunk_size=None):
+        """insert rows (dictionaries as returned by to_dict) into the table
+        of cls, updating the rows that already have the same id
+
+        Returns the number of rows given.
+        """
+        table = cls.__table__
+        total = self.__execute(self._upsert(table), table, rows, chunk_size)
+        self.save()
+        return total
+
+    def amenity_ids(self, place_id):
+        """returns the set of amenity ids linked to a place
+        """
+        return set(self.__session.scalars(
+            select(place_amenity.c.amenity_id).where(
+                place_amenity.c.place_id == place_id)))
+
+    def set_amenity_ids(self, place_id, amenity_ids):
+        """replace the amenities linked to a place, as read from a file
+
+        Rows of place_amenity are written directly, so the place and its
+        amenities must already be stored.
+        """
+        self.__session.flush()
+        self.__session.execute(place_amenity.delete().where(
+            place_amenity.c.place_id == place_id))
+        if amenity_ids:
+            self.__session.execute(place_amenity.insert(), [
+                {'place_id': place_id, 'amenity_id': amenity_id}
+                for amenity_id in amenity_ids])
+
+    def _upsert(self, table):
+        """build the insert-or-update statement, overridden by engines on
+        other databases
+        """
+        from sqlalchemy.dialects import mysql
+        stmt = mysql.insert(table)
+        return stmt.on_duplicate_key_update(
+            {c.name: stmt.inserted[c.name] for c in table.columns
+             if not c.primary_key})
+
+    def __execute(self, stmt, table, rows, chunk_size):
+        """run stmt once per chunk of rows, flushing pending objects first
+        """
+        self.__session.flush()
+        chunk_size = chunk_size or self.__bulk_chunk
+        rows = iter(rows)
+        total = 0
+        while True:
+            chunk = [self.__row(table, row)
+                     for row in islice(rows, chunk_size)]
+            if not chunk:
+                return total
+            self.__session.execute(stmt, chunk)
+            total += len(chunk)
+
+    @staticmethod
+    def __row(table, values):
+        """returns the value of every column of table taken from values
+
+        Missing ids and timestamps are generated, other missing columns
+        take their default, and ISO format timestamps are parsed.
+        """
+        row = {}
+        for column in table.columns:
+            value = values.get(column.name)
+            if value is None:
+                if column.name == 'id':
+                    value = new_id()
+                elif isinstance(column.type, DateTime):
+                    value = datetime.utcnow()
+                elif column.default is not None and column.default.is_scalar:
+                    value = column.default.arg
+            elif isinstance(value, str) and isinstance(column.type, DateTime):
+                value = datetime.fromisoformat(value)
+            row[column.name] = value
+        return row
+
+    def touch(self, obj, name=None):
+        """nothing to do, the session tracks attribute changes itself
+        """
+        pass
+
+    def detach(self, objs):
+        """returns copies of objs that belong to no session, with the
+        attributes and relationships they have loaded, for a cache; None
+        when one of them has changes not yet flushed
+        """
+        if any(inspect(obj).modified for obj in objs):
+            return None
+        return pickle.loads(pickle.dumps(objs))
+
+    def attach(self, objs):
+        """returns copies made by detach merged into the session of this
+        thread, without any query; an object this session already holds
+        is returned in place of its copy
+        """
+        return [self.__session.merge(obj, load=False) for obj in objs]
+
     def save(self):
-        """save changes
+        """save changes, unless a transaction of this thread defers them
+        """
+        if not getattr(self.__local, 'depth', 0):
+            self.__session.commit()
+
+    @contextmanager
+    def transaction(self):
+        """commit once at the end of the block, or roll back if it or the
+        commit raises, so that the session stays usable
         """
-        self.__session.commit()
+        local = self.__local
+        local.depth = getattr(local, 'depth', 0) + 1
+        try:
+            yield self
+        except BaseException:
+            local.depth -= 1
+            if not local.depth:
+                self.rollback()
+            raise
+        local.depth -= 1
+        if not local.depth:
+            try:
+                self.save()
+            except BaseException:
+                self.rollback()
+                raise
+
+    def rollback(self):
+        """discard the changes of the current session
+        """
+        self.__session.rollback()
     
     def delete(self, obj=None):
         """delete an element in the table
@@ -76,13 +480,21 @@ class DBStorage:
 
     def reload(self):
         """configuration
+
+        __session is the scoped_session registry; every call made
+        through it goes to the session of the calling thread.
         """
         Base.metadata.create_all(self.__engine)
-        Sec = sessionmaker(bind=self.__engine)
-        Session = scoped_session(Sec)
-        self.__session = Session()
-    
+        if self.__session is None:
+            if self.__replicas:
+                Sec = sessionmaker(class_=_RoutingSession,
+                                   primary=self.__engine,
+                                   replicas=cycle(self.__replicas))
+            else:
+                Sec = sessionmaker(bind=self.__engine)
+            self.__session = scoped_session(Sec)
+
     def close(self):
-        """close the Session
+        """close the Session of this thread and give back its connection
         """
-        self.__session.close()
+        self.__session.remove()
@@ -0,0 +1,54 @@
+#!/usr/bin/python3
+"""This module defines a stand-in that creates the storage on first use"""
+import threading
+
+
+class DeferredStorage:
+    """Creates and reloads a storage engine the first time it is used
+
+    factory is called, and reload() run on what it returns, on the
+    first attribute access, so importing models neither connects to a
+    database nor reads file.json. Every attribute is then that of the
+    engine. Calls made by the engine's own reload(), such as
+    Place.amenity_ids being restored, reach the engine being loaded.
+    """
+
+    def __init__(self, factory):
+        """Keeps factory, a callable returning the storage engine"""
+        self.__factory = factory
+        self.__storage = None
+        self.__pending = None
+        self.__lock = threading.RLock()
+
+    def __getattr__(self, name):
+        """Forwards everything to the engine, loading it if needed"""
+        return getattr(self.__engine(), name)
+
+    def reload(self):
+        """Loads the engine, or reloads it if it is already loaded"""
+        if self.__storage is None:
+            self.__engine()
+        else:
+            self.__storage.reload()
+
+    def loaded(self):
+        """Returns whether the engine has been created and reloaded"""
+        return self.__storage is not None
+
+    def __engine(self):
+        """Returns the engine, creating and reloading it once"""
+        storage = self.__storage
+        if storage is not None:
+            return storage
+        with self.__lock:
+            if self.__storage is not None:
+                return self.__storage
+            if self.__pending is not None:
+                return self.__pending
+            self.__pending = self.__factory()
+            try:
+                self.__pending.reload()
+                self.__storage = self.__pending
+            finally:
+                self.__pending = None
+            return self.__storage
@@ -1,39 +1,608 @@
 #!/usr/bin/python3
 """This module defines a class to manage file storage for hbnb clone"""
+import atexit
+import heapq
 import json
+import os
+import re
+import threading
+import time
+from contextlib import contextmanager
+from itertools import islice
+from os import getenv
+
+
+def _iter_json_object(f, chunk_size):
+    """Yields the (key, value) pairs of the JSON object in f one by one
+
+    The file is read chunk_size characters at a time and each value is
+    decoded as soon as it is complete, so memory holds one chunk and one
+    value instead of the whole document. Malformed or empty input raises
+    json.JSONDecodeError (a ValueError), as json.load would.
+
+    Each pair is matched with one regular expression for the key, one
+    raw_decode for the value and one for the separator after it; a pair
+    cut by the end of the buffer is decoded again once more is read.
+    """
+    decoder = json.JSONDecoder()
+    raw_decode = decoder.raw_decode
+    start = re.compile(r'[ \t\n\r]*\{[ \t\n\r]*').match
+    pair = re.compile(r'"((?:[^"\\]|\\.)*)"[ \t\n\r]*:[ \t\n\r]*').match
+    sep = re.compile(r'[ \t\n\r]*([,}])[ \t\n\r]*').match
+    buf = ''
+    while True:
+        m = start(buf)
+        if m is not None and m.end() < len(buf):
+            break
+        chunk = f.read(chunk_size)
+        if not chunk:
+            raise json.JSONDecodeError("Expecting '{'" if m is None else
+                                       "Expecting property name", buf,
+                                       len(buf))
+        buf += chunk
+    pos = m.end()
+    if buf[pos] == '}':
+        return
+    while True:
+        m = pair(buf, pos)
+        if m is not None:
+            key = m.group(1)
+            if '\\' in key:
+                key = json.loads('"' + key + '"')
+            try:
+                value, end = raw_decode(buf, m.end())
+            except json.JSONDecodeError:
+                end = None
+            if end is not None:
+                m = sep(buf, end)
+            if end is not None and m is not None and \
+                    (m.end() < len(buf) or m.group(1) == '}'):
+                yield key, value
+                if m.group(1) == '}':
+                    return
+                pos = m.end()
+                if pos >= chunk_size:
+                    # drop what has been consumed so the buffer stays small
+                    buf = buf[pos:]
+                    pos = 0
+                continue
+        chunk = f.read(chunk_size)
+        if not chunk:
+            # let the decoder report what is wrong at pos
+            m = pair(buf, pos)
+            if m is None:
+                raise json.JSONDecodeError("Expecting property name", buf,
+                                           pos)
+            value, end = raw_decode(buf, m.end())
+            raise json.JSONDecodeError("Expecting ',' delimiter", buf, end)
+        buf += chunk
 
 
 class FileStorage:
-    """This class manages storage of hbnb models in JSON format"""
+    """This class manages storage of hbnb models in JSON format
+
+    Besides the flat __objects dictionary, objects are partitioned by
+    class in __partitions ({cls: {key: obj}}) so that all(cls) only
+    reads the objects it returns.
+
+    Objects created, modified (see touch) or deleted since the last save
+    are tracked in __dirty, and the JSON text of every saved object is
+    kept in __encoded, so a save only re-encodes what changed.
+
+    With HBNB_FILE_JOURNAL=on, save() appends the objects changed since
+    the last save to '<file path>.log' instead of rewriting the whole
+    file; the log is folded into the snapshot by compact() once it holds
+    HBNB_FILE_COMPACT_AFTER records.
+
+    reload() streams the snapshot and builds objects one at a time, so
+    its peak memory is the object graph plus one read chunk.
+
+    For the foreign keys listed in __relations, __children indexes the
+    stored objects by parent id ({(class name, foreign key): {parent id:
+    {key: obj}}}) so that children() answers State.cities and
+    Place.reviews without scanning every City or Review.
+
+    Place/Amenity links are kept as sets in both directions,
+    __amenity_ids ({place id: {amenity id}}) and __amenity_places
+    ({amenity id: {place id}}), and saved in the 'amenity_ids' list of
+    each Place record.
+
+    Inside a transaction() block save() does nothing; the block saves
+    once when it ends, or rolls back if it raises. The depth of the
+    blocks is kept per thread (__local) and the outermost block holds
+    __transaction_lock, which flush() takes too: saves made by other
+    threads meanwhile wait for the block to end rather than being
+    skipped or writing its unfinished changes. Objects are shared, so
+    a rollback also discards the unsaved changes other threads made
+    during the block. bulk_new() and bulk_upsert() likewise store many
+    objects with a single save.
+
+    Snapshots are written atomically (temporary file, fsync, rename);
+    HBNB_FILE_SYNC=off|normal|full sets how much is fsynced. With
+    HBNB_FILE_WRITE_BEHIND=<seconds>, save() returns at once and a
+    background thread writes the changes at most that often; flush()
+    waits for them. Changes to the indexes hold __lock so the writer
+    never sees them half done.
+    """
     __file_path = 'file.json'
     __objects = {}
+    __partitions = {}
+    __journal = getenv('HBNB_FILE_JOURNAL') == 'on'
+    __compact_after = int(getenv('HBNB_FILE_COMPACT_AFTER', '1000'))
+    __dirty = {}
+    __encoded = {}
+    __log_records = 0
+    __chunk_size = 1 << 16
+    __bulk_chunk = int(getenv('HBNB_BULK_CHUNK', '1000'))
+    __relations = {'City': 'state_id', 'Review': 'place_id'}
+    __children = {}
+    __parents = {}
+    __amenity_ids = {}
+    __amenity_places = {}
+    __local = threading.local()
+    __write_behind = float(getenv('HBNB_FILE_WRITE_BEHIND', '0'))
+    __sync = getenv('HBNB_FILE_SYNC', 'normal')
+    __lock = threading.RLock()
+    __write_lock = threading.Lock()
+    __transaction_lock = threading.RLock()
+    __pending = threading.Event()
+    __flusher = None
+    __flush_error = None
+    __seen = None
+    __reloads = 0
 
     def all(self, cls=None):
         """Returns a dictionary of models currently in storage"""
         if cls:
             dic = {}
-            for key, val in FileStorage.__objects.items():
-                if isinstance(val, cls):
-                    dic.update({key: val})
+            for part_cls, part in FileStorage.__partitions.items():
+                if issubclass(part_cls, cls):
+                    dic.update(part)
             return dic
         else:
             return FileStorage.__objects
 
+    def get(self, cls, id):
+        """Returns the cls object with this id, or None"""
+        obj = FileStorage.__objects.get(cls.__name__ + '.' + str(id))
+        return obj if isinstance(obj, cls) else None
+
+    def count(self, cls=None):
+        """Returns the number of objects all(cls) would return"""
+        if cls is None:
+            return len(FileStorage.__objects)
+        return sum(len(part)
+                   for part_cls, part in FileStorage.__partitions.items()
+                   if issubclass(part_cls, cls))
+
+    def stream(self, cls=None, chunk_size=None):
+        """Yields the objects all(cls) would return, class by class
+
+        Classes come in foreign key order, parents first, so that the
+        objects can be inserted into a database in that order. They are
+        already in memory, so chunk_size is only taken for compatibility
+        with DBStorage. Each partition is copied as it is reached, so
+        storage may change during the iteration.
+        """
+        from models.base_model import dependency_order
+        partitions = FileStorage.__partitions
+        for part_cls in dependency_order(list(partitions)):
+            if cls is None or issubclass(part_cls, cls):
+                with FileStorage.__lock:
+                    objs = list(partitions[part_cls].values())
+                yield from objs
+
     def new(self, obj):
         """Adds new object to storage dictionary"""
-        self.all().update({obj.to_dict()['__class__'] + '.' + obj.id: obj})
+        key = type(obj).__name__ + '.' + obj.id
+        with FileStorage.__lock:
+            if FileStorage.__dirty.get(key) != 'create':
+                if key in FileStorage.__objects:
+                    FileStorage.__dirty[key] = 'update'
+                else:
+                    FileStorage.__dirty[key] = 'create'
+            self.__add(key, obj)
+
+    def bulk_new(self, objs, chunk_size=None):
+        """Adds many objects to storage and saves them all at once
+
+        The storage lock is taken once per chunk_size objects (default
+        HBNB_BULK_CHUNK) rather than once per object. Returns the number
+        of objects added.
+        """
+        chunk_size = chunk_size or FileStorage.__bulk_chunk
+        objs = iter(objs)
+        total = 0
+        while True:
+            chunk = list(islice(objs, chunk_size))
+            if not chunk:
+                break
+            with FileStorage.__lock:
+                dirty = FileStorage.__dirty
+                for obj in chunk:
+                    key = type(obj).__name__ + '.' + obj.id
+                    if dirty.get(key) != 'create':
+                        dirty[key] = 'update' \
+                            if key in FileStorage.__objects else 'create'
+                    self.__add(key, obj)
+            total += len(chunk)
+        self.save()
+        return total
+
+    def bulk_upsert(self, cls, rows, chunk_size=None):
+        """Stores cls objects built from rows, replacing those with the
+        same id, and saves them all at once
+
+        rows are dictionaries as returned by to_dict(). Returns the
+        number of rows stored.
+        """
+        return self.bulk_new(cls.from_records(rows), chunk_size)
+
+    def touch(self, obj, name=None):
+        """Flags a stored object as modified since the last save
+
+        name is the attribute that was set; when it is an indexed
+        foreign key the object moves to its new parent in __children.
+        """
+        obj_id = obj.__dict__.get('id')
+        if obj_id is None:
+            return
+        key = type(obj).__name__ + '.' + obj_id
+        if FileStorage.__objects.get(key) is not obj:
+            return
+        with FileStorage.__lock:
+            if key not in FileStorage.__dirty:
+                FileStorage.__dirty[key] = 'update'
+            if name is not None and \
+                    FileStorage.__relations.get(type(obj).__name__) == name:
+                self.__link(key, obj)
+
+    def children(self, cls, fk, parent_id):
+        """Returns the list of cls objects whose fk equals parent_id"""
+        index = FileStorage.__children.get((cls.__name__, fk))
+        if index is None:
+            return [obj for obj in self.all(cls).values()
+                    if getattr(obj, fk, None) == parent_id]
+        return list(index.get(parent_id, {}).values())
+
+    def query(self, cls, where=None, order_by=None, limit=None, offset=0,
+              load=None):
+        """Returns the list of cls objects matching where, sorted
+
+        where is a dict of attribute values to match; when it names an
+        indexed foreign key the candidates come from __children instead
+        of the whole partition. order_by is an attribute name or a list
+        of them, '-' prefixed for descending order; objects missing the
+        attribute come last. With a limit and a single sort key only the
+        first offset + limit objects are sorted. load is accepted for
+        compatibility with DBStorage; related objects are always read
+        from the in-memory indexes.
+        """
+        where = dict(where or {})
+        fk = FileStorage.__relations.get(cls.__name__)
+        if fk in where:
+            candidates = self.children(cls, fk, where.pop(fk))
+        else:
+            candidates = self.all(cls).values()
+        if where:
+            candidates = [obj for obj in candidates
+                          if all(getattr(obj, name, None) == value
+                                 for name, value in where.items())]
+        if isinstance(order_by, str):
+            order_by = [order_by]
+        order_by = order_by or []
+        end = None if limit is None else offset + limit
+        if len(order_by) == 1 and end is not None:
+            name = order_by[0].lstrip('-')
+            pick = heapq.nlargest if order_by[0][0] == '-' else \
+                heapq.nsmallest
+            result = pick(end, candidates,
+                          key=self.__sort_key(name, order_by[0][0] == '-'))
+        else:
+            result = list(candidates)
+            for name in reversed(order_by):
+                result.sort(key=self.__sort_key(name.lstrip('-'),
+                                                name[0] == '-'),
+                            reverse=name[0] == '-')
+        return result[offset:end]
+
+    @staticmethod
+    def __sort_key(name, descending=False):
+        """Returns a sort key on attribute name putting None last"""
+        def key(obj):
+            value = getattr(obj, name, None)
+            return ((value is None) != descending, value)
+        return key
 
     def save(self):
-        """Saves storage dictionary to file"""
-        with open(FileStorage.__file_path, 'w') as f:
-            temp = {}
-            temp.update(FileStorage.__objects)
-            for key, val in temp.items():
-                temp[key] = val.to_dict()
-            json.dump(temp, f)
+        """Saves storage dictionary to file
+
+        In write-behind mode the flusher thread is only woken up and the
+        write happens at most HBNB_FILE_WRITE_BEHIND seconds later.
+        """
+        if getattr(FileStorage.__local, 'depth', 0):
+            return
+        if FileStorage.__write_behind:
+            self.__start_flusher()
+            FileStorage.__pending.set()
+            return
+        self.flush()
+
+    def flush(self):
+        """Writes the pending changes now and waits until they are written
+
+        Changes are appended to the log in journal mode, otherwise the
+        whole store is written as a new snapshot. Objects are encoded
+        while holding the storage lock; the file is written after it is
+        released, so other threads only wait for the encoding.
+        """
+        with FileStorage.__transaction_lock, FileStorage.__write_lock:
+            with FileStorage.__lock:
+                FileStorage.__pending.clear()
+                error = FileStorage.__flush_error
+                FileStorage.__flush_error = None
+                if error is not None:
+                    raise error
+                if not FileStorage.__journal:
+                    items = self.__snapshot_items()
+                elif FileStorage.__dirty:
+                    lines = self.__log_lines()
+                    items = None
+                    if FileStorage.__log_records >= \
+                            FileStorage.__compact_after:
+                        items = self.__snapshot_items()
+                else:
+                    return
+            if FileStorage.__journal:
+                self.__write_log(lines)
+            if items is not None:
+                self.__write_snapshot(items)
+
+    @contextmanager
+    def transaction(self):
+        """Defers every save made in the block to a single one at its end
+
+        If the block raises, the changes made since the last save are
+        rolled back instead. Nested blocks join the outermost one, and
+        blocks of other threads wait for it to end. In write-behind mode
+        the outermost block first writes the saves still pending, so a
+        rollback never drops a change whose save() already returned.
+        """
+        local = FileStorage.__local
+        if not getattr(local, 'depth', 0):
+            FileStorage.__transaction_lock.acquire()
+            if FileStorage.__pending.is_set():
+                try:
+                    self.flush()
+                except BaseException:
+                    FileStorage.__transaction_lock.release()
+                    raise
+        local.depth = getattr(local, 'depth', 0) + 1
+        try:
+            yield self
+        except BaseException:
+            local.depth -= 1
+            if not local.depth:
+                try:
+                    self.rollback()
+                finally:
+                    FileStorage.__transaction_lock.release()
+            raise
+        local.depth -= 1
+        if not local.depth:
+            try:
+                self.save()
+            finally:
+                FileStorage.__transaction_lock.release()
+
+    def rollback(self):
+        """Discards the changes made since the last save
+
+        Objects created since then are dropped and the others are read
+        back from file, so references held on modified objects go stale.
+        """
+        with FileStorage.__write_lock, FileStorage.__lock:
+            for key, op in list(FileStorage.__dirty.items()):
+                if op == 'create':
+                    self.delete(FileStorage.__objects[key])
+            FileStorage.__dirty.clear()
+            self.__load()
+
+    def compact(self):
+        """Writes every object to the snapshot file and empties the log"""
+        with FileStorage.__write_lock:
+            with FileStorage.__lock:
+                items = self.__snapshot_items()
+            self.__write_snapshot(items)
+
+    def __log_lines(self):
+        """Encodes the dirty objects as log records and marks them clean"""
+        lines = []
+        for key, op in FileStorage.__dirty.items():
+            if op == 'delete':
+                lines.append(json.dumps({'op': op, 'key': key}) + '\n')
+            else:
+                lines.append('{{"op": "{}", "key": {}, "obj": {}}}\n'.format(
+                    op, json.dumps(key), self.__encode(key, True)))
+        FileStorage.__log_records += len(lines)
+        FileStorage.__dirty.clear()
+        return lines
+
+    def __snapshot_items(self):
+        """Returns the JSON text of every (key, object) and marks all clean"""
+        dirty = FileStorage.__dirty
+        items = [(json.dumps(key), self.__encode(key, key in dirty))
+                 for key in FileStorage.__objects]
+        FileStorage.__log_records = 0
+        FileStorage.__dirty.clear()
+        return items
+
+    def __write_log(self, lines):
+        """Appends lines to the log, synced unless HBNB_FILE_SYNC=off"""
+        path = FileStorage.__file_path
+        with open(path + '.log', 'a') as f:
+            f.writelines(lines)
+            if FileStorage.__sync != 'off':
+                f.flush()
+                os.fsync(f.fileno())
+        if FileStorage.__seen is not None:
+            FileStorage.__seen = (FileStorage.__seen[0],
+                                  self.__stat(path + '.log'))
+
+    def __write_snapshot(self, items):
+        """Replaces the snapshot with items and removes the log
+
+        The snapshot is written to a temporary file, synced unless
+        HBNB_FILE_SYNC=off and renamed over the old one, so a crash
+        leaves either the old or the new store, never a truncated one.
+        With HBNB_FILE_SYNC=full the directory is synced too, making
+        the rename itself durable.
+        """
+        path = FileStorage.__file_path
+        with open(path + '.tmp', 'w') as f:
+            sep = '{'
+            for key, text in items:
+                f.write(sep + key + ': ' + text)
+                sep = ', '
+            f.write('{}' if sep == '{' else '}')
+            if FileStorage.__sync != 'off':
+                f.flush()
+                os.fsync(f.fileno())
+        os.replace(path + '.tmp', path)
+        try:
+            os.remove(path + '.log')
+        except FileNotFoundError:
+            pass
+        if FileStorage.__sync == 'full':
+            fd = os.open(os.path.dirname(os.path.abspath(path)), os.O_RDONLY)
+            try:
+                os.fsync(fd)
+            finally:
+                os.close(fd)
+        FileStorage.__seen = (self.__stat(path), None)
+
+    def __start_flusher(self):
+        """Starts the write-behind thread once per process"""
+        if FileStorage.__flusher is not None:
+            return
+        with FileStorage.__lock:
+            if FileStorage.__flusher is None:
+                FileStorage.__flusher = threading.Thread(
+                    target=self.__flush_loop, name='FileStorage-flusher',
+                    daemon=True)
+                FileStorage.__flusher.start()
+                atexit.register(self.flush)
+
+    def __flush_loop(self):
+        """Flushes pending saves, coalescing those of each interval"""
+        while True:
+            FileStorage.__pending.wait()
+            time.sleep(FileStorage.__write_behind)
+            if not FileStorage.__pending.is_set():
+                continue
+            try:
+                self.flush()
+            except Exception as error:
+                FileStorage.__flush_error = error
 
     def reload(self):
-        """Loads storage dictionary from file"""
+        """Loads storage dictionary from file, replaying its log if any
+
+        Nothing is read when neither the snapshot nor the log changed
+        since this process last read or wrote them. When only the log
+        grew, only its new records are applied. Otherwise the snapshot
+        is streamed and only the objects whose record differs from the
+        stored object are rebuilt; clean objects no longer on file are
+        dropped. Objects with unsaved changes are never replaced.
+        reload_count() tells whether anything was read.
+        """
+        path = FileStorage.__file_path
+        with FileStorage.__write_lock, FileStorage.__lock:
+            snapshot = self.__stat(path)
+            log = self.__stat(path + '.log')
+            if FileStorage.__seen is not None and \
+                    FileStorage.__seen[0] == snapshot:
+                seen_log = FileStorage.__seen[1]
+                if seen_log == log:
+                    return
+                if log is not None and seen_log is not None and \
+                        log[0] == seen_log[0] and log[1] > seen_log[1]:
+                    records = {}
+                    count, offset = self.__replay(records, seen_log[1])
+                    batch = []
+                    for key, val in records.items():
+                        self.__merge(key, val, batch)
+                    self.__build(batch)
+                    FileStorage.__log_records += count
+                    FileStorage.__seen = (snapshot, self.__stat(path + '.log'))
+                    FileStorage.__reloads += 1
+                    return
+            self.__load()
+            FileStorage.__reloads += 1
+
+    def reload_count(self):
+        """Returns how many times reload() has read from file"""
+        return FileStorage.__reloads
+
+    def __load(self):
+        """Reads the whole snapshot and log and merges them into storage"""
+        path = FileStorage.__file_path
+        records = {}
+        FileStorage.__log_records = self.__replay(records, 0)[0]
+        on_file = set(records)
+        batch = []
+        try:
+            with open(path, 'r') as f:
+                for key, val in _iter_json_object(f, self.__chunk_size):
+                    on_file.add(key)
+                    if key not in records:
+                        self.__merge(key, val, batch)
+        except FileNotFoundError:
+            pass
+        for key, val in records.items():
+            self.__merge(key, val, batch)
+        self.__build(batch)
+        for key in list(FileStorage.__objects):
+            if key not in on_file and key not in FileStorage.__dirty:
+                self.__discard(key)
+        FileStorage.__seen = (self.__stat(path), self.__stat(path + '.log'))
+
+    def __merge(self, key, val, batch):
+        """Applies the record val (None if deleted) read from file to key
+
+        Records to build objects from are queued in batch, which is
+        built once it holds __bulk_chunk records; the caller builds the
+        rest.
+        """
+        if key in FileStorage.__dirty:
+            return
+        if val is None:
+            self.__discard(key)
+            return
+        obj = FileStorage.__objects.get(key)
+        if obj is not None and obj.to_dict() == val:
+            return
+        FileStorage.__encoded.pop(key, None)
+        batch.append((key, val))
+        if len(batch) >= FileStorage.__bulk_chunk:
+            self.__build(batch)
+
+    def __build(self, batch):
+        """Builds the objects of the (key, record) pairs in batch, one
+        from_records call per class, stores them and empties batch"""
+        by_class = {}
+        for key, val in batch:
+            by_class.setdefault(val['__class__'], []).append((key, val))
+        classes = FileStorage.__classes()
+        for name, items in by_class.items():
+            objs = classes[name].from_records([val for key, val in items])
+            for (key, val), obj in zip(items, objs):
+                self.__add(key, obj)
+        batch.clear()
+
+    @staticmethod
+    def __classes():
+        """Returns the model classes by name"""
         from models.base_model import BaseModel
         from models.user import User
         from models.place import Place
@@ -42,31 +611,206 @@ class FileStorage:
         from models.amenity import Amenity
         from models.review import Review
 
-        classes = {
-                    'BaseModel': BaseModel, 'User': User, 'Place': Place,
-                    'State': State, 'City': City, 'Amenity': Amenity,
-                    'Review': Review
-                  }
+        return {
+                'BaseModel': BaseModel, 'User': User, 'Place': Place,
+                'State': State, 'City': City, 'Amenity': Amenity,
+                'Review': Review
+               }
+
+    @staticmethod
+    def __stat(path):
+        """Returns (inode, size, mtime) of path, None if it is missing"""
         try:
-            temp = {}
-            with open(FileStorage.__file_path, 'r') as f:
-                temp = json.load(f)
-                for key, val in temp.items():
-                        self.all()[key] = classes[val['__class__']](**val)
+            st = os.stat(path)
         except FileNotFoundError:
-            pass
+            return None
+        return (st.st_ino, st.st_size, st.st_mtime_ns)
 
     def delete(self, obj=None):
         """deletes an object from storage dictionary"""
-        if obj:
-            key = obj.to_dict()['__class__'] + '.' + obj.id
-            try:
-                del FileStorage.__objects[key]
-            except KeyError:
-                pass
+        if not obj:
+            return
+        key = type(obj).__name__ + '.' + obj.id
+        with FileStorage.__lock:
+            if key not in FileStorage.__objects:
+                return
+            if FileStorage.__dirty.get(key) == 'create':
+                del FileStorage.__dirty[key]
+            else:
+                FileStorage.__dirty[key] = 'delete'
+            for place_id in list(self.amenity_places(obj.id)):
+                self.remove_amenity(place_id, obj.id)
+            self.__discard(key)
 
+    def amenity_ids(self, place_id):
+        """Returns the set of amenity ids linked to a place
+
+        The set is the one kept by storage and must not be modified.
+        """
+        return FileStorage.__amenity_ids.get(place_id, frozenset())
+
+    def amenity_places(self, amenity_id):
+        """Returns the set of place ids linked to an amenity
+
+        The set is the one kept by storage and must not be modified.
+        """
+        return FileStorage.__amenity_places.get(amenity_id, frozenset())
+
+    def add_amenity(self, place_id, amenity_id):
+        """Links an amenity to a place"""
+        with FileStorage.__lock:
+            FileStorage.__amenity_ids.setdefault(place_id,
+                                                 set()).add(amenity_id)
+            FileStorage.__amenity_places.setdefault(amenity_id,
+                                                    set()).add(place_id)
+            self.__touch_place(place_id)
+
+    def remove_amenity(self, place_id, amenity_id):
+        """Unlinks an amenity from a place"""
+        with FileStorage.__lock:
+            ids = FileStorage.__amenity_ids.get(place_id)
+            if ids is None or amenity_id not in ids:
+                return
+            ids.discard(amenity_id)
+            if not ids:
+                del FileStorage.__amenity_ids[place_id]
+            places = FileStorage.__amenity_places[amenity_id]
+            places.discard(place_id)
+            if not places:
+                del FileStorage.__amenity_places[amenity_id]
+            self.__touch_place(place_id)
+
+    def set_amenity_ids(self, place_id, amenity_ids):
+        """Replaces the amenities linked to a place, as loaded from file
+
+        Unlike add_amenity, the place is not flagged as modified.
+        """
+        with FileStorage.__lock:
+            for amenity_id in FileStorage.__amenity_ids.pop(place_id, ()):
+                places = FileStorage.__amenity_places[amenity_id]
+                places.discard(place_id)
+                if not places:
+                    del FileStorage.__amenity_places[amenity_id]
+            for amenity_id in amenity_ids:
+                FileStorage.__amenity_ids.setdefault(place_id,
+                                                     set()).add(amenity_id)
+                FileStorage.__amenity_places.setdefault(amenity_id,
+                                                        set()).add(place_id)
 
     def close(self):
-        """reload
+        """write pending saves, then reload
+
+        Only a save not yet written, or a background write that failed,
+        makes it flush, so closing an idle storage writes nothing.
         """
+        if FileStorage.__write_behind and (
+                FileStorage.__pending.is_set() or
+                FileStorage.__flush_error is not None):
+            self.flush()
         self.reload()
+
+    def __add(self, key, obj):
+        """Stores obj under key in __objects and in its class partition"""
+        FileStorage.__objects[key] = obj
+        FileStorage.__partitions.setdefault(type(obj), {})[key] = obj
+        if type(obj).__name__ in FileStorage.__relations:
+            self.__link(key, obj)
+
+    def __remove(self, key):
+        """Drops key from __objects and from its class partition"""
+        obj = FileStorage.__objects.pop(key, None)
+        if obj is not None:
+            part = FileStorage.__partitions.get(type(obj))
+            if part is not None:
+                part.pop(key, None)
+            self.__unlink(key)
+
+    def __discard(self, key):
+        """Forgets the object stored under key and its amenity links"""
+        obj = FileStorage.__objects.get(key)
+        if obj is None:
+            return
+        FileStorage.__encoded.pop(key, None)
+        self.__remove(key)
+        if type(obj).__name__ == 'Place':
+            self.set_amenity_ids(obj.id, ())
+        elif type(obj).__name__ == 'Amenity':
+            for place_id in FileStorage.__amenity_places.pop(obj.id, ()):
+                ids = FileStorage.__amenity_ids[place_id]
+                ids.discard(obj.id)
+                if not ids:
+                    del FileStorage.__amenity_ids[place_id]
+
+    def __touch_place(self, place_id):
+        """Flags the stored place as modified after a link change"""
+        place = FileStorage.__objects.get('Place.' + place_id)
+        if place is not None:
+            self.touch(place)
+
+    def __link(self, key, obj):
+        """Files obj under its current parent id in __children"""
+        self.__unlink(key)
+        fk = FileStorage.__relations[type(obj).__name__]
+        parent_id = getattr(obj, fk, None)
+        if parent_id is None:
+            return
+        index = FileStorage.__children.setdefault(
+            (type(obj).__name__, fk), {})
+        index.setdefault(parent_id, {})[key] = obj
+        FileStorage.__parents[key] = parent_id
+
+    def __unlink(self, key):
+        """Removes key from the children of its previous parent"""
+        parent_id = FileStorage.__parents.pop(key, None)
+        if parent_id is None:
+            return
+        cls_name = key.partition('.')[0]
+        index = FileStorage.__children[(cls_name,
+                                        FileStorage.__relations[cls_name])]
+        siblings = index[parent_id]
+        del siblings[key]
+        if not siblings:
+            del index[parent_id]
+
+    def __encode(self, key, fresh=False):
+        """Returns the JSON text of the object stored under key
+
+        The text is cached; fresh forces it to be rebuilt from the object.
+        """
+        text = None if fresh else FileStorage.__encoded.get(key)
+        if text is None:
+            text = json.dumps(FileStorage.__objects[key].to_dict())
+            FileStorage.__encoded[key] = text
+        return text
+
+    def __replay(self, log, offset):
+        """Reads the log records from offset into log as {key: obj or None}
+
+        None marks a deleted key. A record cut short by a crash can only
+        be the last one; it is dropped and the log truncated so later
+        appends stay readable. Returns the number of records read and
+        the offset of the end of the last one.
+        """
+        log_path = FileStorage.__file_path + '.log'
+        count = 0
+        torn = False
+        try:
+            with open(log_path, 'rb') as f:
+                f.seek(offset)
+                for line in f:
+                    try:
+                        if not line.endswith(b'\n'):
+                            raise ValueError
+                        record = json.loads(line)
+                    except ValueError:
+                        torn = True
+                        break
+                    log[record['key']] = record.get('obj')
+                    offset += len(line)
+                    count += 1
+        except FileNotFoundError:
+            pass
+        if torn:
+            with open(log_path, 'r+b') as f:
+                f.truncate(offset)
+        return count, offset
@@ -0,0 +1,70 @@
+#!/usr/bin/python3
+""" DBStorage on a local SQLite database """
+from sqlalchemy import create_engine, event
+from sqlalchemy.dialects import sqlite
+from sqlalchemy.pool import SingletonThreadPool
+from os import getenv
+from models.engine.db_storage import DBStorage, _MeteredPool
+
+
+class _MeteredSingletonThreadPool(_MeteredPool, SingletonThreadPool):
+    """ SingletonThreadPool with checkout metrics """
+
+
+class SQLiteStorage(DBStorage):
+    """ stores the models in the SQLite file HBNB_SQLITE_PATH
+
+    Same tables and interface as DBStorage, without a MySQL server.
+    Each thread keeps its own connection, and every connection runs in
+    WAL mode, so readers are not blocked by the writer.
+    HBNB_SQLITE_REPLICAS lists database files to read from instead,
+    standing in for the read replicas of DBStorage.
+    """
+    pragmas = {
+               'journal_mode': 'WAL',
+               'synchronous': 'NORMAL',
+               'foreign_keys': 'ON',
+               'busy_timeout': 5000,
+               'cache_size': -20000,
+               'temp_store': 'MEMORY',
+               'mmap_size': 268435456
+              }
+
+    def _create_engine(self, path=None):
+        """build an engine with one connection per thread
+        """
+        path = path or getenv("HBNB_SQLITE_PATH", "hbnb.db")
+        threads = int(getenv("HBNB_SQLITE_THREADS", "16"))
+
+        engine = create_engine('sqlite:///{}'.format(path),
+                               poolclass=_MeteredSingletonThreadPool,
+                               pool_size=threads,
+                               connect_args={'check_same_thread': False})
+        event.listen(engine, 'connect', self._set_pragmas)
+        return engine
+
+    @staticmethod
+    def _replica_locations():
+        """returns the replica files listed in HBNB_SQLITE_REPLICAS
+        """
+        return [path.strip()
+                for path in getenv('HBNB_SQLITE_REPLICAS', '').split(',')
+                if path.strip()]
+
+    def _upsert(self, table):
+        """build an INSERT ... ON CONFLICT (id) DO UPDATE statement
+        """
+        stmt = sqlite.insert(table)
+        return stmt.on_conflict_do_update(
+            index_elements=[c.name for c in table.primary_key],
+            set_={c.name: stmt.excluded[c.name] for c in table.columns
+                  if not c.primary_key})
+
+    @classmethod
+    def _set_pragmas(cls, dbapi_connection, connection_record):
+        """apply the pragmas to a new connection
+        """
+        cursor = dbapi_connection.cursor()
+        for name, value in cls.pragmas.items():
+            cursor.execute('PRAGMA {} = {}'.format(name, value))
+        cursor.close()
@@ -37,12 +37,8 @@ class Place(BaseModel):
     latitude = Column(FLOAT, nullable=True)
     longitude = Column(FLOAT, nullable=True)
 
-    # --- Attribute for FileStorage Only ---
-    if getenv('HBNB_TYPE_STORAGE') != 'db':
-        amenity_ids = []
-
     # --- Conditional Relationships (DBStorage) vs Getters (FileStorage) ---
-    if getenv('HBNB_TYPE_STORAGE') == 'db':
+    if getenv('HBNB_TYPE_STORAGE') in ('db', 'sqlite'):
         # --- Relationships for DBStorage ---
         
         # (Fix 1: Moved inside 'if' block)
@@ -60,6 +56,55 @@ class Place(BaseModel):
     else:
         # --- Getters/Setters for FileStorage ---
 
+        def __init__(self, *args, **kwargs):
+            """
+            Instantiates a Place, linking the amenities it was saved with.
+            """
+            amenity_ids = kwargs.pop('amenity_ids', None)
+            super().__init__(*args, **kwargs)
+            if kwargs:
+                from models import storage
+                storage.set_amenity_ids(self.id, amenity_ids or ())
+
+        def _set_record(self, values):
+            """
+            Stores a record, linking the amenities it was saved with.
+            """
+            from models import storage
+            amenity_ids = values.pop('amenity_ids', None)
+            super()._set_record(values)
+            storage.set_amenity_ids(values['id'], amenity_ids or ())
+
+        def to_dict(self):
+            """
+            Adds the linked amenity ids to the dictionary of the Place.
+            """
+            from models import storage
+            dictionary = super().to_dict()
+            amenity_ids = storage.amenity_ids(self.id)
+            if amenity_ids:
+                dictionary['amenity_ids'] = sorted(amenity_ids)
+            return dictionary
+
+        @property
+        def amenity_ids(self):
+            """
+            Returns the list of Amenity ids linked to this Place.
+            """
+            from models import storage
+            return list(storage.amenity_ids(self.id))
+
+        @amenity_ids.setter
+        def amenity_ids(self, ids):
+            """
+            Replaces the Amenity ids linked to this Place.
+            """
+            from models import storage
+            for amenity_id in list(storage.amenity_ids(self.id)):
+                storage.remove_amenity(self.id, amenity_id)
+            for amenity_id in ids:
+                storage.add_amenity(self.id, amenity_id)
+
         @property
         def reviews(self):
             """
@@ -67,11 +112,7 @@ class Place(BaseModel):
             """
             from models import storage
             from models.review import Review
-            review_list = []
-            for review in storage.all(Review).values():
-                if review.place_id == self.id:
-                    review_list.append(review)
-            return review_list
+            return storage.children(Review, 'place_id', self.id)
 
         @property
         def amenities(self):
@@ -79,18 +120,20 @@ class Place(BaseModel):
             Returns a list of Amenity instances for FileStorage.
             """
             from models import storage
-            from models.amenity import Amenity
+            objects = storage.all()
             amenity_list = []
-            for amenity in storage.all(Amenity).values():
-                if amenity.id in self.amenity_ids:
+            for amenity_id in storage.amenity_ids(self.id):
+                amenity = objects.get('Amenity.' + amenity_id)
+                if amenity is not None:
                     amenity_list.append(amenity)
             return amenity_list
 
         @amenities.setter
         def amenities(self, obj):
             """
-            Handles appending an Amenity's ID for FileStorage.
+            Handles linking an Amenity for FileStorage.
             """
+            from models import storage
             from models.amenity import Amenity
             if isinstance(obj, Amenity):
-                self.amenity_ids.append(obj.id)
+                storage.add_amenity(self.id, obj.id)
@@ -13,6 +13,6 @@ class Review(BaseModel):
     user_id = Column(String(60),ForeignKey("users.id") , nullable=False)
     text = Column(String(1024), nullable=False)
 
-    if getenv('HBNB_TYPE_STORAGE') == 'db':
+    if getenv('HBNB_TYPE_STORAGE') in ('db', 'sqlite'):
         user = relationship("User", back_populates="reviews")
         place = relationship("Place", back_populates="reviews")
@@ -10,16 +10,11 @@ class State(BaseModel):
     __tablename__ = 'states'
     name = Column(String(128), nullable=False)
 
-    if getenv("HBNB_TYPE_STORAGE") == 'db':
+    if getenv("HBNB_TYPE_STORAGE") in ('db', 'sqlite'):
         cities = relationship('City', back_populates="state", cascade="all, delete")
     else:
         @property
         def cities(self):
             from models import storage
-            from models.city import City 
-            cities_list = []
-            dic_of_all_Cities = storage.all(City)
-            for city in dic_of_all_Cities.values():
-                if self.id == city.state_id:
-                    cities_list.append(city)
-            return cities_list
+            from models.city import City
+            return storage.children(City, 'state_id', self.id)
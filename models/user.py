@@ -13,6 +13,6 @@ class User(BaseModel):
     first_name = Column(String(128))
     last_name = Column(String(128))
 
-    if getenv('HBNB_TYPE_STORAGE') == 'db':
+    if getenv('HBNB_TYPE_STORAGE') in ('db', 'sqlite'):
         places = relationship("Place", back_populates="user", cascade="all, delete, delete-orphan")
         reviews = relationship("Review", back_populates="user", cascade="all, delete, delete-orphan")
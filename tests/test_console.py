@@ -0,0 +1,338 @@
+#!/usr/bin/python3
+""" Module for testing the console"""
+import io
+import json
+import os
+import pstats
+import tempfile
+import unittest
+from os import getenv
+from unittest import mock
+from console import HBNBCommand
+from models import storage
+from models.base_model import BaseModel
+from models.state import State
+from models.city import City
+from models.user import User
+from models.place import Place
+from models.amenity import Amenity
+
+
+class test_consoleBase(unittest.TestCase):
+    """ Base of the console tests: an empty storage and a console """
+
+    def setUp(self):
+        """ Empty the storage, make a console """
+        self.empty()
+        self.console = HBNBCommand()
+
+    def tearDown(self):
+        """ Empty the storage, remove the file the tests saved """
+        self.empty()
+        try:
+            os.remove('file.json')
+        except FileNotFoundError:
+            pass
+
+    @staticmethod
+    def empty():
+        """ Deletes every stored object, children first """
+        for obj in reversed(list(storage.stream())):
+            storage.delete(obj)
+        storage.save()
+
+    def run_commands(self, *lines):
+        """ Runs lines through precmd, returns (stdout, stderr) """
+        out, err = io.StringIO(), io.StringIO()
+        with mock.patch('sys.stdout', out), mock.patch('sys.stderr', err):
+            for line in lines:
+                self.console.onecmd(self.console.precmd(line))
+        return out.getvalue(), err.getvalue()
+
+    def run_command(self, line):
+        """ Runs line, returns the lines it printed """
+        return self.run_commands(line)[0].splitlines()
+
+
+class test_batch(test_consoleBase):
+    """ Class to test batch begin/commit and run_batch """
+
+    @unittest.skipIf(getenv('HBNB_TYPE_STORAGE') in ('db', 'sqlite'),
+                     "FileStorage writes")
+    def test_single_save(self):
+        """ The creates of a batch are saved once, at commit """
+        with mock.patch.object(type(storage), 'flush',
+                               autospec=True) as flush:
+            out, err = self.run_commands(
+                'batch begin', 'create State name="a"',
+                'create State name="b"')
+            flush.assert_not_called()
+            self.run_commands('batch commit')
+            self.assertEqual(flush.call_count, 1)
+        self.assertEqual(len(out.split()), 2)
+        self.assertEqual(storage.count(State), 2)
+
+    def test_errors(self):
+        """ Failed commands are reported, the others are committed """
+        out, err = self.run_commands(
+            'batch begin', 'create Nope', 'create State name="a"',
+            'show State 1234', 'batch commit')
+        self.assertIn("#1 create Nope: ** class doesn't exist **", err)
+        self.assertIn("#3 show State 1234: ** no instance found **", err)
+        self.assertIn("commit: 3 commands, 2 errors", err)
+        self.assertEqual(storage.count(State), 1)
+
+    def test_exception(self):
+        """ A command that raises is an error, not the end of the batch """
+        state = State(name="a")
+        state.save()
+        out, err = self.run_commands(
+            'batch begin', 'update State {} max_guest x'.format(state.id),
+            'batch commit')
+        self.assertIn('ValueError', err)
+        self.assertIn("commit: 1 commands, 1 errors", err)
+
+    def test_rollback(self):
+        """ batch rollback discards the commands of the batch """
+        self.run_commands('batch begin', 'create State name="a"',
+                          'batch rollback')
+        self.assertEqual(storage.count(State), 0)
+
+    def test_nesting(self):
+        """ begin twice, or commit without begin, is refused """
+        out, err = self.run_commands('batch commit', 'batch begin',
+                                     'batch begin', 'batch rollback')
+        self.assertIn("** no batch begun **", out)
+        self.assertIn("** batch already begun **", out)
+
+    def test_run_batch(self):
+        """ run_batch runs a file up to quit, in one batch """
+        with tempfile.NamedTemporaryFile('w', suffix='.txt',
+                                         delete=False) as script:
+            script.write('create State name="a"\n\nState.count()\n'
+                         'quit\ncreate State name="b"\n')
+        self.addCleanup(os.remove, script.name)
+        out, err = io.StringIO(), io.StringIO()
+        with mock.patch('sys.stdout', out), mock.patch('sys.stderr', err):
+            stats = self.console.run_batch(script.name)
+        self.assertEqual(stats['commands'], 2)
+        self.assertEqual(stats['errors'], 0)
+        self.assertTrue(stats['committed'])
+        self.assertEqual(out.getvalue().split()[-1], '1')
+        self.assertEqual(storage.count(State), 1)
+
+
+class test_lookup(test_consoleBase):
+    """ Class to test the commands that look one object up """
+
+    def test_count_exact(self):
+        """ count, like all, only counts objects of exactly that class """
+        state = State(name="a")
+        storage.new(state)
+        storage.new(City(name="b", state_id=state.id))
+        if getenv('HBNB_TYPE_STORAGE') not in ('db', 'sqlite'):
+            storage.new(BaseModel())
+        storage.save()
+        expected = len(self.run_command('all BaseModel'))
+        self.assertEqual(self.run_command('count BaseModel'),
+                         [str(expected)])
+        self.assertEqual(self.run_command('BaseModel.count()'),
+                         [str(expected)])
+        self.assertEqual(self.run_command('count State'), ['1'])
+
+    def test_get_not_all(self):
+        """ show, destroy and update use get, not all() """
+        state = State(name="a")
+        state.save()
+        with mock.patch.object(storage, 'all', side_effect=AssertionError):
+            self.run_command('update State {} name "b"'.format(state.id))
+            self.assertEqual(storage.get(State, state.id).name, "b")
+            self.assertEqual(self.run_command('update State 1234 name "c"'),
+                             ["** no instance found **"])
+            self.assertEqual(self.run_command('destroy State 1234'),
+                             ["** no instance found **"])
+            self.run_command('destroy State ' + state.id)
+            self.assertIsNone(storage.get(State, state.id))
+            self.assertEqual(self.run_command('show BaseModel 1234'),
+                             ["** no instance found **"])
+
+
+class test_exportImport(test_consoleBase):
+    """ Class to test the export and import commands """
+
+    def setUp(self):
+        """ Store a state, a city, a user and a place with an amenity """
+        super().setUp()
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        state = State(name="Utah")
+        city = City(name="Provo", state_id=state.id)
+        user = User(email="a@b.c", password="pwd")
+        place = Place(name="Home", city_id=city.id, user_id=user.id,
+                      number_rooms=3, latitude=1.5)
+        amenity = Amenity(name="Wifi")
+        for obj in (place, user, city, state, amenity):
+            storage.new(obj)
+        storage.save()
+        storage.set_amenity_ids(place.id, [amenity.id])
+        storage.save()
+        self.place_id = place.id
+        self.amenity_id = amenity.id
+
+    def round_trip(self, name):
+        """ Exports all to name, empties storage and imports it back """
+        path = os.path.join(self.tmp.name, name)
+        self.assertIn("exported 5 objects", self.run_command(
+            'export all ' + path)[-1])
+        self.empty()
+        self.assertEqual(storage.count(Place), 0)
+        with mock.patch.object(HBNBCommand, 'bulk_chunk', 1):
+            self.assertIn("imported 5 objects", self.run_command(
+                'import ' + path)[-1])
+        place = storage.get(Place, self.place_id)
+        self.assertEqual((place.name, place.number_rooms, place.latitude),
+                         ("Home", 3, 1.5))
+        self.assertEqual(storage.count(City), 1)
+        return path
+
+    def test_jsonl(self):
+        """ JSON Lines hold one record per object """
+        path = self.round_trip('all.jsonl')
+        with open(path) as stream:
+            records = [json.loads(line) for line in stream]
+        self.assertEqual([r['__class__'] for r in records][-1], 'Place')
+        place = storage.get(Place, self.place_id)
+        self.assertEqual([amenity.id for amenity in place.amenities],
+                         [self.amenity_id])
+
+    def test_csv(self):
+        """ CSV rows are converted back to the column types """
+        path = self.round_trip('all.csv')
+        with open(path) as stream:
+            self.assertTrue(stream.readline().startswith(
+                '__class__,id,created_at,updated_at,'))
+
+    def test_export_class(self):
+        """ export <className> only writes that class """
+        path = os.path.join(self.tmp.name, 'states.jsonl')
+        self.assertIn("exported 1 objects", self.run_command(
+            'export State ' + path)[-1])
+        self.assertEqual(self.run_command('export Nope ' + path),
+                         ["** class doesn't exist **"])
+        self.assertEqual(self.run_command('export State'),
+                         ["** path missing **"])
+
+    def test_bad_record(self):
+        """ A bad record imports nothing """
+        path = os.path.join(self.tmp.name, 'bad.jsonl')
+        with open(path, 'w') as stream:
+            stream.write('{"__class__": "State", "name": "Ohio"}\n')
+            stream.write('{"__class__": "Nope"}\n')
+        self.assertEqual(self.run_command('import ' + path), [
+            "** record 2: class doesn't exist, nothing imported **"])
+        self.assertEqual(storage.count(State), 1)
+
+
+class test_all(test_consoleBase):
+    """ Class to test the streaming all command """
+
+    def setUp(self):
+        """ Store three states and a city """
+        super().setUp()
+        self.states = [State(name=name) for name in ("a", "b", "c")]
+        for state in self.states:
+            storage.new(state)
+        storage.new(City(name="d", state_id=self.states[0].id))
+        storage.save()
+
+    def test_one_per_line(self):
+        """ Every object is printed on its own line """
+        lines = self.run_command('all State')
+        self.assertEqual(sorted(lines), sorted(str(s) for s in self.states))
+        self.assertEqual(len(self.run_command('all')), 4)
+        self.assertEqual(self.run_command('State.all()'), lines)
+
+    def test_limit_offset(self):
+        """ limit and offset select a page """
+        lines = self.run_command('all State')
+        self.assertEqual(self.run_command('all State limit=2'), lines[:2])
+        self.assertEqual(self.run_command('all State offset=1 limit=1'),
+                         lines[1:2])
+        self.assertEqual(self.run_command('State.all(offset=2)'), lines[2:])
+        self.assertEqual(len(self.run_command('all limit=3')), 3)
+
+    def test_fields(self):
+        """ fields projects each object on the attributes named """
+        lines = self.run_command('State.all(limit=1, fields=name, id)')
+        self.assertEqual(len(lines), 1)
+        state = storage.get(State, lines[0].split('(')[1].split(')')[0])
+        self.assertEqual(lines[0], "[State] ({}) {}".format(
+            state.id, {'name': state.name, 'id': state.id}))
+
+    def test_errors(self):
+        """ Bad classes and options are reported """
+        self.assertEqual(self.run_command('all Nope'),
+                         ["** class doesn't exist **"])
+        self.assertEqual(self.run_command('all State limit=x'),
+                         ["** limit and offset must be positive integers **"])
+        self.assertEqual(self.run_command('all State size=1'),
+                         ["** unknown option: size **"])
+
+    def test_all_args(self):
+        """ Dot syntax arguments are turned into key=value options """
+        self.assertEqual(HBNBCommand._all_args('limit=50, fields=name, id'),
+                         ['limit=50', 'fields=name,id'])
+        self.assertEqual(HBNBCommand._all_args(''), [])
+
+
+class test_profile(test_consoleBase):
+    """ Class to test the profile command """
+
+    def test_report(self):
+        """ The command runs and its report follows its output """
+        lines = self.run_command('profile top=5 create State name="a"')
+        self.assertEqual(storage.count(State), 1)
+        self.assertEqual(lines[0], list(storage.all(State).values())[0].id)
+        self.assertRegex(lines[1], r'^wall time [0-9.]+ s, -?[0-9]+ bytes '
+                                   r'allocated, [0-9]+ bytes peak$')
+        self.assertRegex(lines[2], r'^storage calls: .*_storage\.new 1')
+        self.assertIn('List reduced from', '\n'.join(lines))
+
+    def test_dump(self):
+        """ dump writes a pstats file """
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, 'count.prof')
+            self.run_command('profile dump={} State.count()'.format(path))
+            names = {func[2] for func in pstats.Stats(path).stats}
+        self.assertIn('do_count', names)
+
+    def test_dot_syntax(self):
+        """ A wrapped dot syntax command is reformatted by profile """
+        State(name="a").save()
+        lines = self.run_command('profile top=3 State.count()')
+        self.assertEqual(lines[0], '1')
+        self.assertTrue(lines[1].startswith('wall time '))
+        lines = self.run_command('profile State.all()')
+        self.assertTrue(lines[0].startswith('[State] '))
+        self.assertTrue(lines[1].startswith('wall time '))
+
+    def test_errors(self):
+        """ A missing command and bad options are reported """
+        self.assertEqual(self.run_command('profile'),
+                         ["** command missing **"])
+        self.assertEqual(self.run_command('profile top=x count State'),
+                         ["** bad top or sort option **"])
+        self.assertEqual(self.run_command('profile sort=nope count State'),
+                         ["** bad top or sort option **"])
+
+    def test_in_batch(self):
+        """ Inside a batch, the profiled command is counted once """
+        out, err = self.run_commands('batch begin',
+                                     'profile show State 1234',
+                                     'batch commit')
+        self.assertIn("#1 show State 1234: ** no instance found **", err)
+        self.assertIn("commit: 1 commands, 1 errors", err)
+
+
+if __name__ == "__main__":
+    unittest.main()
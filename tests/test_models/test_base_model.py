@@ -1,11 +1,13 @@
 #!/usr/bin/python3
 """ """
-from models.base_model import BaseModel
+from models.base_model import BaseModel, uuid7
 import unittest
+from unittest import mock
 import datetime
 from uuid import UUID
 import json
 import os
+import time
 
 
 class test_basemodel(unittest.TestCase):
@@ -97,3 +99,47 @@ class test_basemodel(unittest.TestCase):
         n = new.to_dict()
         new = BaseModel(**n)
         self.assertFalse(new.created_at == new.updated_at)
+
+
+class test_ids(unittest.TestCase):
+    """ Tests of the id generators """
+
+    def test_uuid7(self):
+        """ uuid7 ids carry the time and sort in creation order """
+        ids = [uuid7() for i in range(5000)]
+        self.assertEqual(ids, sorted(ids))
+        self.assertEqual(len(set(ids)), len(ids))
+        self.assertEqual({i.version for i in ids}, {7})
+        ms = ids[0].int >> 80
+        self.assertLess(abs(ms / 1000 - time.time()), 5)
+
+    def test_id_format(self):
+        """ HBNB_ID_FORMAT picks the generator, ids stay strings """
+        with mock.patch('models.base_model.ID_FORMAT', 'uuid7'):
+            first, second = BaseModel().id, BaseModel().id
+        self.assertEqual(UUID(first).version, 7)
+        self.assertLess(first, second)
+        self.assertEqual(UUID(BaseModel().id).version, 4)
+
+
+class test_from_records(unittest.TestCase):
+    """ Tests of the bulk constructor """
+
+    def test_round_trip(self):
+        """ from_records rebuilds what to_dict saved """
+        from models.state import State
+        for cls in (BaseModel, State):
+            old = cls()
+            old.name = "x"
+            new, = cls.from_records([old.to_dict()])
+            self.assertIs(type(new), cls)
+            self.assertEqual(new.to_dict(), old.to_dict())
+            self.assertEqual(new.created_at, old.created_at)
+
+    def test_defaults(self):
+        """ Missing ids and timestamps are generated """
+        record = {'__class__': 'BaseModel', 'name': "x"}
+        new, = BaseModel.from_records([record])
+        self.assertEqual(UUID(new.id).version, 4)
+        self.assertEqual(type(new.updated_at), datetime.datetime)
+        self.assertEqual(record, {'__class__': 'BaseModel', 'name': "x"})
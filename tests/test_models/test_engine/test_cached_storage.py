@@ -0,0 +1,175 @@
+#!/usr/bin/python3
+""" Module for testing the storage result cache"""
+import os
+import threading
+import unittest
+from os import getenv
+from unittest import mock
+import models
+from models.base_model import BaseModel
+from models.state import State
+from models.city import City
+from models.engine.file_storage import FileStorage
+from models.engine.cached_storage import CachedStorage
+
+
+class test_cachedStorage(unittest.TestCase):
+    """ Class to test the CachedStorage wrapper around FileStorage """
+
+    def setUp(self):
+        """ Wrap an empty FileStorage and make it the models' storage """
+        self.inner = FileStorage()
+        for obj in list(self.inner.all().values()):
+            self.inner.delete(obj)
+        self.inner._FileStorage__dirty.clear()
+        self.storage = CachedStorage(self.inner, size=2)
+        patcher = mock.patch('models.storage', self.storage)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def tearDown(self):
+        """ Remove the file the tests saved """
+        try:
+            os.remove('file.json')
+        except FileNotFoundError:
+            pass
+
+    def test_hit_miss(self):
+        """ A repeated query is served from the cache """
+        self.storage.new(State(name="b"))
+        self.storage.new(State(name="a"))
+        first = self.storage.query(State, order_by='name')
+        with mock.patch.object(self.inner, 'query') as query:
+            second = self.storage.query(State, order_by='name')
+        query.assert_not_called()
+        self.assertEqual(first, second)
+        self.assertIsNot(first, second)
+        stats = self.storage.cache_stats()
+        self.assertEqual((stats['hits'], stats['misses']), (1, 1))
+
+    def test_invalidation(self):
+        """ Writes to a class make its results stale, and only those """
+        state = State(name="a")
+        self.storage.new(state)
+        self.storage.query(State, order_by='name')
+        self.storage.all(City)
+        state.name = "b"
+        self.assertEqual(self.storage.query(State, order_by='name')[0].name,
+                         "b")
+        self.storage.new(State(name="a"))
+        self.assertEqual(len(self.storage.query(State, order_by='name')), 2)
+        self.storage.delete(state)
+        self.assertEqual(len(self.storage.query(State, order_by='name')), 1)
+        self.storage.all(City)
+        self.assertEqual(self.storage.cache_stats()['hits'], 1)
+
+    def test_subclass(self):
+        """ all(BaseModel) is made stale by writes to any model """
+        self.assertEqual(self.storage.all(BaseModel), {})
+        self.storage.new(City())
+        self.assertEqual(len(self.storage.all(BaseModel)), 1)
+
+    def test_lru(self):
+        """ The least recently used result is evicted first """
+        self.storage.all(State)
+        self.storage.all(City)
+        self.storage.all(State)
+        self.storage.all(BaseModel)
+        stats = self.storage.cache_stats()
+        self.assertEqual((stats['size'], stats['evictions']), (2, 1))
+        self.storage.all(State)
+        self.assertEqual(self.storage.cache_stats()['hits'], 2)
+
+    def test_rollback_reload(self):
+        """ rollback and a reload that read new data clear the cache """
+        self.storage.new(State(name="a"))
+        self.storage.save()
+        self.storage.all(State)
+        self.storage.new(State(name="b"))
+        self.storage.all(State)
+        self.storage.rollback()
+        self.assertEqual(self.storage.cache_stats()['size'], 0)
+        self.assertEqual(len(self.storage.all(State)), 1)
+        self.storage.reload()
+        self.assertEqual(self.storage.cache_stats()['size'], 1)
+        FileStorage._FileStorage__seen = None
+        self.storage.reload()
+        self.assertEqual(self.storage.cache_stats()['size'], 0)
+
+    def test_forwarding(self):
+        """ Other methods reach the wrapped storage """
+        state = State()
+        self.storage.new(state)
+        self.assertIs(self.storage.get(State, state.id), state)
+        self.assertEqual(self.storage.count(State), 1)
+
+
+@unittest.skipIf(getenv('HBNB_TYPE_STORAGE') != 'sqlite',
+                 "SQLite storage only")
+class test_cachedDBStorage(unittest.TestCase):
+    """ Class to test the CachedStorage wrapper around SQLiteStorage """
+
+    def setUp(self):
+        """ Wrap the models' storage, store a state and a city """
+        self.inner = models.storage
+        self.inner.rollback()
+        self.storage = CachedStorage(self.inner)
+        patcher = mock.patch('models.storage', self.storage)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        state = State(name="Utah")
+        state.save()
+        City(name="Provo", state_id=state.id).save()
+        self.state_id = state.id
+        self.storage.close()
+
+    def tearDown(self):
+        """ Delete what the test stored """
+        self.inner.rollback()
+        for cls in (City, State):
+            for obj in self.inner.all(cls).values():
+                self.inner.delete(obj)
+        self.inner.save()
+        self.inner.close()
+
+    def test_across_close(self):
+        """ Results outlive commit and close(), as between requests """
+        for _ in range(3):
+            self.storage.query(State, load='cities')
+            self.storage.query(State, load='cities')
+            self.storage.close()
+        stats = self.storage.cache_stats()
+        self.assertEqual((stats['hits'], stats['size']), (5, 1))
+        City(name="Orem", state_id=self.state_id).save()
+        self.storage.close()
+        states = self.storage.query(State, load='cities')
+        self.assertEqual(states[0].name, "Utah")
+        self.assertEqual(len(states[0].cities), 2)
+
+    def test_attached(self):
+        """ A hit returns objects of the caller's session, saved as such """
+        self.storage.query(State)
+        self.storage.close()
+        state = self.storage.query(State)[0]
+        self.assertIs(self.storage.get(State, self.state_id), state)
+        state.name = "Nevada"
+        state.save()
+        self.storage.close()
+        self.assertEqual(self.storage.query(State)[0].name, "Nevada")
+        self.assertEqual(self.storage.cache_stats()['hits'], 1)
+
+    def test_threads(self):
+        """ Other threads hit too, in their own sessions """
+        mine = self.storage.all(State)
+        names = []
+
+        def work():
+            names.extend(s.name for s in self.storage.all(State).values())
+            self.storage.close()
+        thread = threading.Thread(target=work)
+        thread.start()
+        thread.join()
+        self.assertEqual(names, ["Utah"])
+        self.assertEqual(self.storage.cache_stats()['hits'], 1)
+        self.assertEqual(list(self.storage.all(State).values()),
+                         list(mine.values()))
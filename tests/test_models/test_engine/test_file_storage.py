@@ -1,9 +1,19 @@
 #!/usr/bin/python3
 """ Module for testing file storage"""
 import unittest
+from unittest import mock
 from models.base_model import BaseModel
+from models.state import State
+from models.city import City
+from models.place import Place
+from models.amenity import Amenity
+from models.review import Review
 from models import storage
+from models.engine.file_storage import FileStorage
+import json
 import os
+import threading
+import time
 
 
 class test_fileStorage(unittest.TestCase):
@@ -11,18 +21,21 @@ class test_fileStorage(unittest.TestCase):
 
     def setUp(self):
         """ Set up test environment """
-        del_list = []
-        for key in storage._FileStorage__objects.keys():
-            del_list.append(key)
-        for key in del_list:
-            del storage._FileStorage__objects[key]
+        for obj in list(storage.all().values()):
+            storage.delete(obj)
+        storage._FileStorage__dirty.clear()
 
     def tearDown(self):
         """ Remove storage file at end of tests """
-        try:
-            os.remove('file.json')
-        except:
-            pass
+        FileStorage._FileStorage__journal = False
+        FileStorage._FileStorage__chunk_size = 1 << 16
+        FileStorage._FileStorage__write_behind = 0
+        FileStorage._FileStorage__sync = 'normal'
+        for path in ('file.json', 'file.json.log'):
+            try:
+                os.remove(path)
+            except:
+                pass
 
     def test_obj_list_empty(self):
         """ __objects is initially empty """
@@ -107,3 +120,462 @@ class test_fileStorage(unittest.TestCase):
         from models.engine.file_storage import FileStorage
         print(type(storage))
         self.assertEqual(type(storage), FileStorage)
+
+    def test_all_cls_partition(self):
+        """ all(cls) only returns objects of cls """
+        state = State()
+        city = City()
+        storage.new(state)
+        storage.new(city)
+        self.assertEqual(storage.all(State), {'State.' + state.id: state})
+        self.assertEqual(storage.all(City), {'City.' + city.id: city})
+
+    def test_all_cls_subclasses(self):
+        """ all(BaseModel) still returns instances of every subclass """
+        state = State()
+        storage.new(state)
+        self.assertIn('State.' + state.id, storage.all(BaseModel))
+
+    def test_delete_partition(self):
+        """ Deleted objects leave their class partition """
+        state = State()
+        storage.new(state)
+        storage.delete(state)
+        self.assertEqual(storage.all(State), {})
+        self.assertNotIn('State.' + state.id, storage.all())
+
+    def test_journal_save_appends(self):
+        """ Journaled save only appends the changed objects """
+        FileStorage._FileStorage__journal = True
+        first = State()
+        first.save()
+        second = State()
+        second.save()
+        with open('file.json.log', 'r') as f:
+            lines = f.readlines()
+        self.assertEqual(len(lines), 2)
+        self.assertIn(second.id, lines[1])
+        self.assertNotIn(first.id, lines[1])
+
+    def test_journal_reload_replays(self):
+        """ reload rebuilds objects from snapshot plus log """
+        FileStorage._FileStorage__journal = True
+        kept = State()
+        kept.save()
+        storage.compact()
+        gone = State()
+        gone.save()
+        kept.name = "Texas"
+        kept.save()
+        storage.delete(gone)
+        storage.save()
+        for obj in list(storage.all().values()):
+            storage._FileStorage__remove('State.' + obj.id)
+        FileStorage._FileStorage__seen = None
+        storage.reload()
+        self.assertEqual(list(storage.all(State)), ['State.' + kept.id])
+        self.assertEqual(storage.all()['State.' + kept.id].name, "Texas")
+
+    def test_journal_torn_record(self):
+        """ A partially written last record is dropped on reload """
+        FileStorage._FileStorage__journal = True
+        new = State()
+        new.save()
+        with open('file.json.log', 'a') as f:
+            f.write('{"op": "create", "key": "State.x", "ob')
+        storage.reload()
+        self.assertNotIn('State.x', storage.all())
+        with open('file.json.log', 'r') as f:
+            self.assertEqual(len(f.readlines()), 1)
+
+    def test_compact(self):
+        """ compact folds the log into the snapshot """
+        FileStorage._FileStorage__journal = True
+        new = State()
+        new.save()
+        storage.compact()
+        self.assertFalse(os.path.exists('file.json.log'))
+        with open('file.json', 'r') as f:
+            self.assertIn('State.' + new.id, json.load(f))
+
+    def test_touch_on_setattr(self):
+        """ Setting an attribute flags a stored object as dirty """
+        new = State()
+        new.save()
+        self.assertEqual(storage._FileStorage__dirty, {})
+        new.name = "Ohio"
+        self.assertEqual(storage._FileStorage__dirty,
+                         {'State.' + new.id: 'update'})
+
+    def test_save_encodes_dirty_only(self):
+        """ save only calls to_dict on objects changed since last save """
+        first = State()
+        first.save()
+        second = State()
+        second.save()
+        second.name = "Utah"
+        with mock.patch.object(State, 'to_dict', autospec=True,
+                               side_effect=BaseModel.to_dict) as to_dict:
+            storage.save()
+        self.assertEqual(to_dict.call_count, 1)
+        with open('file.json', 'r') as f:
+            j = json.load(f)
+        self.assertEqual(j['State.' + second.id]['name'], "Utah")
+        self.assertEqual(j['State.' + first.id], first.to_dict())
+
+    def test_delete_then_save(self):
+        """ Deleted objects are dropped from the saved file """
+        new = State()
+        new.save()
+        storage.delete(new)
+        storage.save()
+        with open('file.json', 'r') as f:
+            self.assertEqual(json.load(f), {})
+
+    def test_reload_small_chunks(self):
+        """ Streaming reload handles values cut across read chunks """
+        first = State()
+        first.name = 'Quote " and brace } \u00e9'
+        first.save()
+        second = State()
+        second.save()
+        FileStorage._FileStorage__chunk_size = 7
+        for obj in list(storage.all().values()):
+            storage._FileStorage__remove('State.' + obj.id)
+        FileStorage._FileStorage__seen = None
+        storage.reload()
+        self.assertEqual(len(storage.all(State)), 2)
+        self.assertEqual(storage.all()['State.' + first.id].name, first.name)
+
+    def test_reload_empty_object(self):
+        """ An empty JSON object loads nothing """
+        with open('file.json', 'w') as f:
+            f.write(' { } ')
+        storage.reload()
+        self.assertEqual(storage.all(), {})
+
+    def test_reload_malformed(self):
+        """ A truncated file raises ValueError like json.load """
+        with open('file.json', 'w') as f:
+            f.write('{"State.1": {"id": "1"')
+        with self.assertRaises(ValueError):
+            storage.reload()
+
+    def test_state_cities_index(self):
+        """ State.cities follows new, update and delete of cities """
+        state = State()
+        other = State()
+        city = City(state_id=state.id)
+        storage.new(city)
+        self.assertEqual(state.cities, [city])
+        city.state_id = other.id
+        self.assertEqual(state.cities, [])
+        self.assertEqual(other.cities, [city])
+        storage.delete(city)
+        self.assertEqual(other.cities, [])
+
+    def test_place_reviews_index(self):
+        """ Place.reviews returns the reviews of that place only """
+        place = Place()
+        review = Review(place_id=place.id)
+        storage.new(review)
+        storage.new(Review(place_id='elsewhere'))
+        self.assertEqual(place.reviews, [review])
+
+    def test_children_reload(self):
+        """ Reloaded objects are indexed under their parent """
+        state = State()
+        state.save()
+        City(state_id=state.id).save()
+        for obj in list(storage.all().values()):
+            storage._FileStorage__remove(type(obj).__name__ + '.' + obj.id)
+        FileStorage._FileStorage__seen = None
+        storage.reload()
+        state = storage.all()['State.' + state.id]
+        self.assertEqual(len(state.cities), 1)
+
+    def test_amenity_ids_per_place(self):
+        """ Each place has its own amenity ids """
+        first = Place()
+        second = Place()
+        amenity = Amenity()
+        storage.new(amenity)
+        first.amenities = amenity
+        first.amenities = amenity
+        self.assertEqual(first.amenity_ids, [amenity.id])
+        self.assertEqual(second.amenity_ids, [])
+        self.assertEqual(first.amenities, [amenity])
+        self.assertEqual(storage.amenity_places(amenity.id), {first.id})
+
+    def test_amenity_ids_persisted(self):
+        """ Links are saved with the place and restored by reload """
+        place = Place()
+        place.save()
+        amenity = Amenity()
+        amenity.save()
+        place.amenities = amenity
+        self.assertIn('Place.' + place.id, storage._FileStorage__dirty)
+        storage.save()
+        storage.set_amenity_ids(place.id, ())
+        FileStorage._FileStorage__seen = None
+        storage.reload()
+        self.assertEqual(storage.amenity_ids(place.id), {amenity.id})
+
+    def test_delete_amenity_unlinks(self):
+        """ Deleting an amenity removes it from every place """
+        place = Place()
+        amenity = Amenity()
+        storage.new(place)
+        storage.new(amenity)
+        place.amenities = amenity
+        storage.delete(amenity)
+        self.assertEqual(place.amenity_ids, [])
+        self.assertEqual(storage.amenity_places(amenity.id), frozenset())
+
+    def test_transaction_single_save(self):
+        """ Saves in a transaction are written once at its end """
+        with storage.transaction():
+            first = State()
+            first.save()
+            second = State()
+            second.save()
+            self.assertFalse(os.path.exists('file.json'))
+        with open('file.json', 'r') as f:
+            j = json.load(f)
+        self.assertIn('State.' + first.id, j)
+        self.assertIn('State.' + second.id, j)
+
+    def test_transaction_rollback(self):
+        """ A failing transaction drops its changes """
+        kept = State(name="Iowa")
+        kept.save()
+        with self.assertRaises(RuntimeError):
+            with storage.transaction():
+                State().save()
+                kept.name = "Idaho"
+                kept.save()
+                raise RuntimeError
+        self.assertEqual(list(storage.all(State)), ['State.' + kept.id])
+        self.assertEqual(storage.all(State)['State.' + kept.id].name, "Iowa")
+        self.assertEqual(storage._FileStorage__local.depth, 0)
+
+    def test_transaction_write_behind(self):
+        """ A rollback keeps the saves made before the transaction """
+        FileStorage._FileStorage__write_behind = 0.5
+        kept = State(name="Iowa")
+        kept.save()
+        with self.assertRaises(RuntimeError):
+            with storage.transaction():
+                State().save()
+                raise RuntimeError
+        self.assertEqual(list(storage.all(State)), ['State.' + kept.id])
+        with open('file.json', 'r') as f:
+            self.assertIn('State.' + kept.id, json.load(f))
+
+    def test_transaction_threads(self):
+        """ Saves of other threads wait for a transaction to end """
+        saved = threading.Event()
+
+        def save_other():
+            other = State(name="Ohio")
+            other.save()
+            saved.set()
+            self.other = other
+        with storage.transaction():
+            first = State(name="Iowa")
+            first.save()
+            thread = threading.Thread(target=save_other)
+            thread.start()
+            self.assertFalse(saved.wait(0.2))
+            self.assertFalse(os.path.exists('file.json'))
+        thread.join()
+        with open('file.json', 'r') as f:
+            j = json.load(f)
+        self.assertIn('State.' + first.id, j)
+        self.assertIn('State.' + self.other.id, j)
+
+    def test_write_behind(self):
+        """ save returns before writing; flush waits for the write """
+        FileStorage._FileStorage__write_behind = 0.5
+        new = State()
+        new.save()
+        self.assertFalse(os.path.exists('file.json'))
+        storage.flush()
+        with open('file.json', 'r') as f:
+            self.assertIn('State.' + new.id, json.load(f))
+
+    def test_write_behind_idle_close(self):
+        """ close only writes when a save is pending """
+        FileStorage._FileStorage__write_behind = 0.5
+        new = State()
+        new.save()
+        storage.close()
+        self.assertTrue(os.path.exists('file.json'))
+        with mock.patch.object(FileStorage,
+                               '_FileStorage__write_snapshot') as write:
+            for _ in range(5):
+                storage.close()
+        write.assert_not_called()
+        self.assertIs(storage.all()['State.' + new.id], new)
+
+    def test_write_behind_thread(self):
+        """ The background thread writes pending saves by itself """
+        FileStorage._FileStorage__write_behind = 0.01
+        new = State()
+        new.save()
+        for _ in range(500):
+            if not storage._FileStorage__pending.is_set() and \
+                    os.path.exists('file.json'):
+                break
+            time.sleep(0.01)
+        with open('file.json', 'r') as f:
+            self.assertIn('State.' + new.id, json.load(f))
+
+    def test_atomic_snapshot(self):
+        """ Snapshots leave no temporary file behind """
+        FileStorage._FileStorage__sync = 'full'
+        new = State()
+        new.save()
+        self.assertTrue(os.path.exists('file.json'))
+        self.assertFalse(os.path.exists('file.json.tmp'))
+
+    def test_close_skips_unchanged_file(self):
+        """ close does not read the file again when it did not change """
+        new = State()
+        new.save()
+        with mock.patch('models.engine.file_storage._iter_json_object') \
+                as reader:
+            storage.close()
+        reader.assert_not_called()
+        self.assertIs(storage.all()['State.' + new.id], new)
+
+    def test_reload_applies_delta(self):
+        """ Only objects changed on file are rebuilt """
+        kept = State(name="Maine")
+        kept.save()
+        changed = State(name="Ohio")
+        changed.save()
+        with open('file.json', 'r') as f:
+            j = json.load(f)
+        j['State.' + changed.id]['name'] = "Oregon"
+        with open('file.json', 'w') as f:
+            json.dump(j, f)
+        storage.close()
+        self.assertIs(storage.all()['State.' + kept.id], kept)
+        self.assertEqual(storage.all()['State.' + changed.id].name, "Oregon")
+
+    def test_reload_drops_removed(self):
+        """ Clean objects no longer on file are dropped """
+        new = State()
+        new.save()
+        with open('file.json', 'w') as f:
+            f.write('{}')
+        storage.close()
+        self.assertNotIn('State.' + new.id, storage.all())
+
+    def test_reload_log_tail(self):
+        """ Records appended to the log by another writer are applied """
+        FileStorage._FileStorage__journal = True
+        new = State()
+        new.save()
+        storage.reload()
+        other = State(name="Vermont")
+        with open('file.json.log', 'a') as f:
+            f.write(json.dumps({'op': 'create', 'key': 'State.' + other.id,
+                                'obj': other.to_dict()}) + '\n')
+        storage.close()
+        self.assertEqual(storage.all()['State.' + other.id].name, "Vermont")
+        self.assertIs(storage.all()['State.' + new.id], new)
+
+    def test_query_order_limit(self):
+        """ query sorts and pages the objects of a class """
+        for name in ["b", "d", "a", "c"]:
+            storage.new(State(name=name))
+        storage.new(City(name="a"))
+        names = [s.name for s in storage.query(State, order_by='name')]
+        self.assertEqual(names, ["a", "b", "c", "d"])
+        names = [s.name for s in storage.query(State, order_by='-name',
+                                                limit=2, offset=1)]
+        self.assertEqual(names, ["c", "b"])
+
+    def test_query_where(self):
+        """ query filters on attribute values, using the parent index """
+        state = State()
+        storage.new(City(state_id=state.id, name="b"))
+        storage.new(City(state_id=state.id, name="a"))
+        storage.new(City(state_id="other", name="a"))
+        found = storage.query(City, where={'state_id': state.id},
+                              order_by='name')
+        self.assertEqual([c.name for c in found], ["a", "b"])
+        found = storage.query(City, where={'name': "a"})
+        self.assertEqual(len(found), 2)
+
+    def test_query_none_last(self):
+        """ Objects without the sort attribute come last """
+        storage.new(State())
+        storage.new(State(name="a"))
+        names = [s.name for s in storage.query(State, order_by='name')]
+        self.assertEqual(names, ["a", None])
+        names = [s.name for s in storage.query(State, order_by='-name')]
+        self.assertEqual(names, ["a", None])
+
+    def test_get(self):
+        """ get looks an object up by class and id """
+        new = State()
+        storage.new(new)
+        self.assertIs(storage.get(State, new.id), new)
+        self.assertIs(storage.get(BaseModel, new.id), None)
+        self.assertIs(storage.get(City, new.id), None)
+        self.assertIs(storage.get(State, "missing"), None)
+
+    def test_count(self):
+        """ count matches the size of all() """
+        storage.new(State())
+        storage.new(State())
+        storage.new(City())
+        self.assertEqual(storage.count(State), 2)
+        self.assertEqual(storage.count(City), 1)
+        self.assertEqual(storage.count(), len(storage.all()))
+        self.assertEqual(storage.count(BaseModel), len(storage.all()))
+
+    def test_stream(self):
+        """ stream yields what all() holds, parent classes first """
+        state = State()
+        city = City(state_id=state.id)
+        storage.new(city)
+        storage.new(state)
+        self.assertEqual(list(storage.stream(State)), [state])
+        self.assertEqual(list(storage.stream()), [state, city])
+        streamed = storage.stream(City)
+        storage.delete(city)
+        self.assertEqual(list(streamed), [])
+
+    def test_bulk_new(self):
+        """ bulk_new stores every object and saves once """
+        states = [State(name=str(i)) for i in range(25)]
+        with mock.patch.object(FileStorage, 'flush') as flush:
+            self.assertEqual(storage.bulk_new(states, chunk_size=10), 25)
+        flush.assert_called_once_with()
+        self.assertEqual(storage.count(State), 25)
+        self.assertIs(storage.get(State, states[7].id), states[7])
+
+    def test_bulk_upsert(self):
+        """ bulk_upsert builds objects from rows, replacing existing ones """
+        state = State(name="Utah")
+        storage.new(state)
+        storage.save()
+        rows = [dict(state.to_dict(), name="Nevada"), {'name': "Ohio"}]
+        self.assertEqual(storage.bulk_upsert(State, rows), 2)
+        self.assertEqual(storage.count(State), 2)
+        self.assertEqual(storage.get(State, state.id).name, "Nevada")
+        storage.reload()
+        names = sorted(s.name for s in storage.all(State).values())
+        self.assertEqual(names, ["Nevada", "Ohio"])
+
+    def test_query_load(self):
+        """ load is accepted and related objects come from the indexes """
+        state = State(name="Utah")
+        storage.new(state)
+        storage.new(City(state_id=state.id, name="Provo"))
+        found = storage.query(State, load=['cities'])
+        self.assertEqual([c.name for c in found[0].cities], ["Provo"])
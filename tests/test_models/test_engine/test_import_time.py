@@ -0,0 +1,82 @@
+#!/usr/bin/python3
+""" Module for testing what importing models loads, with -X importtime"""
+import os
+import subprocess
+import sys
+import tempfile
+import unittest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.dirname(
+    os.path.dirname(os.path.abspath(__file__)))))
+
+
+def import_models(env=None, code='import models'):
+    """Runs code in a new interpreter with -X importtime
+
+    Returns (stdout, {module name: cumulative microseconds}). The
+    interpreter runs in an empty directory, so no file.json is found.
+    """
+    environ = {k: v for k, v in os.environ.items()
+               if not k.startswith('HBNB_')}
+    environ.update(env or {})
+    environ['PYTHONPATH'] = ROOT
+    with tempfile.TemporaryDirectory() as cwd:
+        result = subprocess.run([sys.executable, '-X', 'importtime', '-c',
+                                 code], cwd=cwd, env=environ,
+                                capture_output=True, text=True, check=True)
+    modules = {}
+    for line in result.stderr.splitlines():
+        if line.startswith('import time:') and '|' in line:
+            _, cumulative, name = line[len('import time:'):].split('|')
+            if cumulative.strip().isdigit():
+                modules[name.strip()] = int(cumulative)
+    return result.stdout, modules
+
+
+class test_importTime(unittest.TestCase):
+    """ Importing models only loads the selected storage engine """
+
+    def test_file_mode(self):
+        """ File mode loads neither the database engines nor the cache """
+        _, modules = import_models()
+        self.assertIn('models.engine.file_storage', modules)
+        for name in ('models.engine.db_storage',
+                     'models.engine.sqlite_storage',
+                     'models.engine.cached_storage',
+                     'models.engine.deferred_storage',
+                     'sqlalchemy.dialects.mysql',
+                     'sqlalchemy.dialects.sqlite'):
+            self.assertNotIn(name, modules)
+
+    def test_sqlite_mode(self):
+        """ The sqlite engine does not load the MySQL dialect """
+        with tempfile.TemporaryDirectory() as tmp:
+            _, modules = import_models({
+                'HBNB_TYPE_STORAGE': 'sqlite',
+                'HBNB_SQLITE_PATH': os.path.join(tmp, 'hbnb.db')})
+        self.assertIn('models.engine.sqlite_storage', modules)
+        self.assertNotIn('sqlalchemy.dialects.mysql', modules)
+
+    def test_cache(self):
+        """ HBNB_CACHE_SIZE loads the cache """
+        out, modules = import_models(
+            {'HBNB_CACHE_SIZE': '8'},
+            'import models; print(type(models.storage).__name__)')
+        self.assertIn('models.engine.cached_storage', modules)
+        self.assertEqual(out.strip(), 'CachedStorage')
+
+    def test_deferred_reload(self):
+        """ HBNB_DEFER_RELOAD=on reloads on first use, not at import """
+        out, modules = import_models({'HBNB_DEFER_RELOAD': 'on'}, """
+import models
+from models.state import State
+print(models.storage.loaded())
+models.storage.new(State(name='California'))
+print(models.storage.loaded(), len(models.storage.all(State)))
+""")
+        self.assertEqual(out.split(), ['False', 'True', '1'])
+        self.assertIn('models.engine.deferred_storage', modules)
+
+
+if __name__ == "__main__":
+    unittest.main()
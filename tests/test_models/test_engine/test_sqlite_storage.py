@@ -0,0 +1,281 @@
+#!/usr/bin/python3
+""" Module for testing the SQLite storage engine"""
+import os
+import tempfile
+import threading
+import unittest
+from datetime import datetime
+from os import getenv
+from unittest import mock
+from sqlalchemy import event
+from models import storage
+from models.state import State
+from models.city import City
+from models.user import User
+from models.place import Place
+from models.review import Review
+from models.amenity import Amenity
+from models.base_model import Base, BaseModel
+from models.engine.db_storage import DBStorage
+from models.engine.sqlite_storage import SQLiteStorage
+
+
+@unittest.skipIf(getenv('HBNB_TYPE_STORAGE') != 'sqlite',
+                 "SQLite storage only")
+class test_sqliteStorage(unittest.TestCase):
+    """ Class to test the SQLite storage engine """
+
+    def setUp(self):
+        """ Discard what earlier tests left in the session """
+        storage.rollback()
+
+    def tearDown(self):
+        """ Discard what the test left in the session """
+        storage.rollback()
+        for obj in storage.all(City).values():
+            storage.delete(obj)
+        for obj in storage.all(State).values():
+            storage.delete(obj)
+        storage.save()
+
+    def test_type(self):
+        """ storage is a SQLiteStorage """
+        from models.engine.sqlite_storage import SQLiteStorage
+        self.assertEqual(type(storage), SQLiteStorage)
+
+    def test_pragmas(self):
+        """ Connections run in WAL mode with foreign keys on """
+        with storage._DBStorage__engine.connect() as conn:
+            mode = conn.exec_driver_sql('PRAGMA journal_mode').scalar()
+            fks = conn.exec_driver_sql('PRAGMA foreign_keys').scalar()
+        self.assertEqual(mode.lower(), 'wal')
+        self.assertEqual(fks, 1)
+
+    def test_new_save_all(self):
+        """ Saved objects are returned by all """
+        state = State(name="Nevada")
+        state.save()
+        self.assertIn('State.' + state.id, storage.all(State))
+
+    def test_relationship(self):
+        """ State.cities is the ORM relationship """
+        state = State(name="Texas")
+        state.save()
+        city = City(name="Austin", state_id=state.id)
+        city.save()
+        self.assertEqual([c.id for c in state.cities], [city.id])
+
+    def test_transaction_rollback(self):
+        """ A failing transaction commits nothing """
+        with self.assertRaises(RuntimeError):
+            with storage.transaction():
+                State(name="Utah").save()
+                raise RuntimeError
+        self.assertEqual(storage.all(State), {})
+
+    def test_transaction_commit_fails(self):
+        """ A commit failing at the end of the block is rolled back """
+        from sqlalchemy.exc import IntegrityError
+        with self.assertRaises(IntegrityError):
+            with storage.transaction():
+                City(name="Nowhere", state_id="missing").save()
+        self.assertEqual(storage.count(State), 0)
+        State(name="Utah").save()
+        self.assertEqual(storage.count(State), 1)
+
+    def test_query(self):
+        """ query filters, sorts and pages in SQL """
+        for name in ["b", "d", "a", "c"]:
+            State(name=name).save()
+        names = [s.name for s in storage.query(State, order_by='-name',
+                                                limit=2, offset=1)]
+        self.assertEqual(names, ["c", "b"])
+        found = storage.query(State, where={'name': "a"})
+        self.assertEqual([s.name for s in found], ["a"])
+
+    def test_get_count(self):
+        """ get and count run as single primary key and COUNT queries """
+        new = State(name="Utah")
+        new.save()
+        State(name="Ohio").save()
+        self.assertIs(storage.get(State, new.id), new)
+        self.assertIsNone(storage.get(State, "missing"))
+        self.assertEqual(storage.count(State), 2)
+        self.assertEqual(storage.count(), 2)
+
+    def test_get_count_base_model(self):
+        """ BaseModel has no table: no rows of its own, its subclasses' """
+        State(name="Utah").save()
+        self.assertIsNone(storage.get(BaseModel, "missing"))
+        self.assertEqual(storage.count(BaseModel), storage.count())
+
+    def test_stream(self):
+        """ stream yields every row, parent tables first """
+        state = State(name="Utah")
+        state.save()
+        City(name="Provo", state_id=state.id).save()
+        self.assertEqual([obj.name for obj in storage.stream(State, 1)],
+                         ["Utah"])
+        self.assertEqual([type(obj) for obj in storage.stream()
+                          if type(obj) in (State, City)], [State, City])
+
+    def test_bulk_new(self):
+        """ bulk_new inserts every object in chunks """
+        states = [State(name="s{}".format(i)) for i in range(25)]
+        self.assertEqual(storage.bulk_new(states, chunk_size=10), 25)
+        self.assertEqual(storage.count(State), 25)
+        self.assertEqual(storage.get(State, states[3].id).name, "s3")
+
+    def test_bulk_new_persistent(self):
+        """ bulk_new objects can be saved again, children may come first """
+        state = State(name="Utah")
+        city = City(name="Provo", state_id=state.id)
+        state_id = state.id
+        self.assertEqual(storage.bulk_new([city, state]), 2)
+        state.name = "Nevada"
+        state.save()
+        city.save()
+        storage.close()
+        self.assertEqual(storage.get(State, state_id).name, "Nevada")
+        self.assertEqual(storage.count(City), 1)
+
+    def test_bulk_upsert(self):
+        """ bulk_upsert inserts new rows and updates existing ones """
+        new = State(name="Utah")
+        new.save()
+        rows = [{'id': new.id, 'name': "Nevada"},
+                {'name': "Ohio", 'created_at': "2020-01-02T03:04:05"}]
+        self.assertEqual(storage.bulk_upsert(State, rows), 2)
+        storage.close()
+        storage.reload()
+        names = [s.name for s in storage.query(State, order_by='name')]
+        self.assertEqual(names, ["Nevada", "Ohio"])
+
+    def test_all_one_query(self):
+        """ all() fetches every key in one query, objects on first use """
+        state = State(name="Utah")
+        state.save()
+        key = 'State.' + state.id
+        City(name="Provo", state_id=state.id).save()
+        engine = storage._DBStorage__engine
+        statements = []
+
+        def count(*args):
+            statements.append(args)
+        event.listen(engine, 'before_cursor_execute', count)
+        try:
+            objs = storage.all()
+            self.assertEqual(len(statements), 1)
+            self.assertEqual(len(objs), 2)
+            self.assertIn(key, objs)
+            self.assertEqual(len(statements), 1)
+            self.assertEqual(objs[key].name, "Utah")
+            self.assertEqual(sorted(type(o).__name__ for o in objs.values()),
+                             ["City", "State"])
+        finally:
+            event.remove(engine, 'before_cursor_execute', count)
+
+    def test_query_load(self):
+        """ load fetches the relationships a page walks up front """
+        user = User(email="a@b.c", password="pwd", first_name="Al")
+        state = State(name="Utah")
+        city = City(name="Provo", state_id=state.id)
+        wifi = Amenity(name="Wifi")
+        for obj in (user, state, city, wifi):
+            storage.new(obj)
+        for i in range(3):
+            place = Place(name="p{}".format(i), city_id=city.id,
+                          user_id=user.id)
+            place.amenities.append(wifi)
+            storage.new(place)
+            storage.new(Review(text="ok", place_id=place.id,
+                               user_id=user.id))
+        storage.save()
+        storage.close()
+        storage.reload()
+        engine = storage._DBStorage__engine
+        statements = []
+
+        def count(*args):
+            statements.append(args)
+        event.listen(engine, 'before_cursor_execute', count)
+        try:
+            places = storage.query(Place, order_by='name',
+                                   load=['user', 'amenities', 'reviews.user'])
+            for place in places:
+                self.assertEqual(place.user.first_name, "Al")
+                self.assertEqual([a.name for a in place.amenities], ["Wifi"])
+                self.assertEqual([r.user.first_name for r in place.reviews],
+                                 ["Al"])
+        finally:
+            event.remove(engine, 'before_cursor_execute', count)
+        self.assertEqual(len(statements), 5)
+
+    def test_session_per_thread(self):
+        """ Each thread works in its own session, ended by close() """
+        registry = storage._DBStorage__session
+        mine = registry()
+        theirs = []
+
+        def work():
+            theirs.append(registry())
+            storage.count(State)
+            storage.close()
+        thread = threading.Thread(target=work)
+        thread.start()
+        thread.join()
+        self.assertIsNot(theirs[0], mine)
+        self.assertIs(registry(), mine)
+        storage.close()
+        self.assertIsNot(registry(), mine)
+
+    def test_pool_stats(self):
+        """ pool_stats counts checkouts and connections in use """
+        before = storage.pool_stats()['checkouts']
+        storage.count(State)
+        storage.save()
+        stats = storage.pool_stats()
+        self.assertGreater(stats['checkouts'], before)
+        self.assertGreaterEqual(stats['peak_in_use'], 1)
+        self.assertIn('status', stats)
+
+    def test_pool_options(self):
+        """ The MySQL pool is sized from HBNB_POOL_* variables """
+        env = {'HBNB_POOL_SIZE': '20', 'HBNB_POOL_MAX_OVERFLOW': '0',
+               'HBNB_POOL_RECYCLE': '60', 'HBNB_POOL_TIMEOUT': '2.5'}
+        with mock.patch.dict(os.environ, env):
+            self.assertEqual(DBStorage._pool_options(),
+                             {'pool_size': 20, 'max_overflow': 0,
+                              'pool_recycle': 60, 'pool_timeout': 2.5})
+
+    def test_replicas(self):
+        """ Reads go to the replicas in turn, writes and later reads of
+        the same session to the primary """
+        tmp = tempfile.mkdtemp()
+        env = {'HBNB_SQLITE_PATH': os.path.join(tmp, 'primary.db'),
+               'HBNB_SQLITE_REPLICAS': '{0}/r1.db,{0}/r2.db'.format(tmp)}
+        with mock.patch.dict(os.environ, env):
+            routed = SQLiteStorage()
+        routed.reload()
+        replicas = routed._DBStorage__replicas
+        for engine in replicas:
+            Base.metadata.create_all(engine)
+        with replicas[0].begin() as conn:
+            conn.execute(State.__table__.insert(),
+                         {'id': '1', 'name': "Ohio",
+                          'created_at': datetime.utcnow(),
+                          'updated_at': datetime.utcnow()})
+        try:
+            self.assertEqual([routed.count(State) for i in range(4)],
+                             [1, 0, 1, 0])
+            routed.close()
+            routed.new(State(name="Utah"))
+            routed.save()
+            self.assertEqual([routed.count(State) for i in range(2)],
+                             [1, 1])
+            self.assertEqual(routed.query(State)[0].name, "Utah")
+            routed.close()
+            self.assertEqual([routed.count(State) for i in range(2)],
+                             [1, 0])
+        finally:
+            routed.close()
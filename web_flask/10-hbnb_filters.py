@@ -18,11 +18,9 @@ def hbnb_filters():
     Fetches all State, City, and Amenity objects from storage,
     sorts them by name (A-Z), and renders the HBNB filters page.
     """
-    all_states = storage.all(State).values()
-    sorted_states = sorted(all_states, key=lambda state: state.name)
-    
-    all_amenities = storage.all(Amenity).values()
-    sorted_amenities = sorted(all_amenities, key=lambda amenity: amenity.name)
+    sorted_states = storage.query(State, order_by='name', load='cities')
+
+    sorted_amenities = storage.query(Amenity, order_by='name')
     
     return render_template('10-hbnb_filters.html',
                            states=sorted_states,
@@ -20,8 +20,7 @@ def close_sess(e):
 
 @app.route("/states_list", strict_slashes=False)
 def state():
-    states = storage.all(State).values()
-    sorted_states = sorted(states, key=lambda state: state.name)
+    sorted_states = storage.query(State, order_by='name')
     return render_template("7-states_list.html", States=sorted_states)
 
 
@@ -15,10 +15,10 @@ app = Flask(__name__)
 def cities_by_states():
     """
     Fetches all State objects from storage, sorts them by name (A-Z),
-    and renders them. The template will handle displaying cities.
+    and renders them. The template will handle displaying cities,
+    which are loaded along with the states.
     """
-    all_states = storage.all(State).values()
-    sorted_states = sorted(all_states, key=lambda state: state.name)
+    sorted_states = storage.query(State, order_by='name', load='cities')
     
     return render_template('8-cities_by_states.html', states=sorted_states)
 
@@ -18,9 +18,7 @@ def states_list():
     Fetches all State objects from storage, sorts them by name (A-Z),
     and passes the list to the template.
     """
-    all_states = storage.all(State).values()
-    
-    sorted_states = sorted(all_states, key=lambda state: state.name)
+    sorted_states = storage.query(State, order_by='name')
     
     return render_template('9-states.html', states=sorted_states)
 
@@ -32,8 +30,7 @@ def state_detail(id):
     If found, passes the State object to the template.
     If not found, passes None.
     """
-    key = f"State.{id}"
-    state = storage.all(State).get(key)
+    state = storage.get(State, id)
     
     return render_template('9-states.html', state=state)
 